@@ -0,0 +1,144 @@
+import os, hashlib, threading
+from collections import OrderedDict
+from io import BytesIO
+
+import customtkinter as ctk
+from PIL import Image
+
+from .settings import log_debug, log_error, log_info, settings
+
+_thumb_path = 'thumbs'
+
+class ArtworkCache:
+    """
+    Ready-to-display cover thumbnails keyed by a hash of the artwork bytes.
+    Lookups go memory LRU -> on-disk thumbnail -> full decode, so a cover
+    that was seen in an earlier session is never decoded at full size again.
+    """
+    def __init__(self, size=(180, 180), path=_thumb_path):
+        self.size = size
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        # thumbnails are stored at 2x so they stay sharp with widget scaling
+        self._thumb_size = (size[0] * 2, size[1] * 2)
+        threading.Thread(target=self.prune_disk, daemon=True).start()
+
+    def _thumb_file(self, key):
+        return os.path.join(self.path, key[:2], key + ".png")
+
+    def get(self, cover_data):
+        """CTkImage for raw cover bytes, or None if they cannot be decoded."""
+        if not cover_data:
+            return None
+        return self.get_key(hashlib.sha1(cover_data).hexdigest(), lambda: cover_data)
+
+    def get_key(self, key, load):
+        """
+        CTkImage for the cover whose sha1 is key; load() returns the raw bytes
+        and is only called when no thumbnail is cached.
+        """
+        if not key:
+            return None
+        with self._lock:
+            photo = self._lru.get(key)
+            if photo is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                self._log_stats()
+                return photo
+
+        img = self._load_thumb(key)
+        if img is not None:
+            self.disk_hits += 1
+        else:
+            cover_data = load()
+            img = self._decode(cover_data, key) if cover_data else None
+            if img is None:
+                return None
+            self.misses += 1
+
+        photo = ctk.CTkImage(img, size=self.size)
+        with self._lock:
+            self._lru[key] = photo
+            while len(self._lru) > max(1, int(settings.artwork_cache_entries)):
+                self._lru.popitem(last=False)
+            self._log_stats()
+        return photo
+
+    def _load_thumb(self, key):
+        if not settings.artwork_disk_cache:
+            return None
+        thumb = self._thumb_file(key)
+        if not os.path.exists(thumb):
+            return None
+        try:
+            img = Image.open(thumb)
+            img.load()
+            os.utime(thumb)  # keep recently used thumbnails when pruning
+            return img
+        except Exception as e:
+            log_error(f"Broken artwork thumbnail {thumb}: {e}", e)
+            return None
+
+    def _decode(self, cover_data, key):
+        try:
+            img = Image.open(BytesIO(cover_data))
+            # let the JPEG decoder scale down while decoding
+            img.draft("RGB", self._thumb_size)
+            img = img.convert("RGB")
+            img.thumbnail(self._thumb_size)
+        except Exception as e:
+            if settings.debug_mode:
+                log_error(f"Cannot decode cover art: {e}", e)
+            return None
+
+        if settings.artwork_disk_cache:
+            thumb = self._thumb_file(key)
+            try:
+                os.makedirs(os.path.dirname(thumb), exist_ok=True)
+                img.save(thumb, "PNG")
+            except OSError as e:
+                log_error(f"Cannot write artwork thumbnail {thumb}: {e}", e)
+        return img
+
+    def _log_stats(self):
+        if settings.artwork_cache_stats:
+            log_debug(f"Artwork cache: {self.stats()}")
+
+    def stats(self):
+        return {"entries": len(self._lru), "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def prune_disk(self):
+        """Drop the least recently written thumbnails above artwork_disk_cache_mb."""
+        limit = int(settings.artwork_disk_cache_mb) * 1024 * 1024
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, full))
+                total += st.st_size
+        if total <= limit:
+            return
+        files.sort()
+        for _, size, full in files:
+            if total <= limit:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
+        if settings.debug_mode:
+            log_info(f"Artwork disk cache pruned to {total // 1024} KB")
+
+artwork_cache = ArtworkCache()
@@ -1,41 +1,40 @@
 import os, json
 
-from .settings import log_debug, log_error, log_info
+from .settings import log_error, log_info
+from .store import LibraryStore
+from .playlist import Playlist
 
 _config_path = 'config.json'
 
+# playlists live in library.db; config.json is only read once to migrate it
+library_store = LibraryStore()
+
+def _migrate_config():
+    data = {"playlists": {}}
+    if os.path.exists(_config_path):
+        try:
+            with open(_config_path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log_error(f"Cannot read {_config_path}, starting with an empty library: {e}", e)
+
+    # duplicate/invalid ids from older versions are fixed before they become keys
+    playlists = {name: list(Playlist(songs)) for name, songs in (data.get("playlists") or {}).items()}
+    library_store.replace_all(playlists)
+    if os.path.exists(_config_path):
+        # keep the old file around instead of deleting it
+        os.replace(_config_path, _config_path + '.bak')
+        log_info(f"Migrated {len(playlists)} playlists from {_config_path} to {library_store.path}")
+
 def load_config():
-    if not os.path.exists(_config_path):
-        default = {"playlists": {}}
-        with open(_config_path, 'w') as f:
-            json.dump(default, f, indent=4)
-        return default
-
-    try:
-        with open(_config_path) as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        default = {"playlists": {}}
-        with open(_config_path, 'w') as f:
-            json.dump(default, f, indent=4)
-        return default
+    if not library_store.initialized:
+        _migrate_config()
+    return library_store.load()
 
 def save_config(data):
-    with open(_config_path, 'w') as f:
-        json.dump(data, f, indent=4)
+    """Replace the whole library with data["playlists"] in one transaction."""
+    library_store.replace_all(data["playlists"])
 
 def save_config_rt(playlists):
-    clean_playlists = {}
-    for pname, songs in playlists.items():
-        clean_list = []
-        for s in songs:
-            clean_list.append({
-                "id":   s["id"],
-                "name": s["name"],
-                "file": s["file"]
-            })
-        clean_playlists[pname] = clean_list
-
-    data_to_save = { "playlists": clean_playlists }
-    log_debug(f"Saving config: {data_to_save}")
-    save_config(data_to_save)
\ No newline at end of file
+    """Persist only the songs and playlists that changed since the last save."""
+    library_store.sync(playlists)
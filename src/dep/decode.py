@@ -0,0 +1,189 @@
+import math, shutil, subprocess, wave
+
+import numpy as np
+
+# Streaming PCM decoding and the analysis jobs built on it (loudness,
+# waveform peaks). Nothing here imports the app (settings, Tk, databases):
+# these functions run in spawned pool worker processes, which import only
+# this module.
+
+FFMPEG = "ffmpeg"
+BLOCK_FRAMES = 1 << 16
+BUCKETS = 1200  # waveform (min, max) pairs per track, int8: 2.4 KB on disk
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG) is not None
+
+def open_pcm(path, rate=44100, channels=2, block_frames=BLOCK_FRAMES):
+    """
+    (rate, chunks) for an audio file: chunks yields float32 arrays of shape
+    (frames, channels) in [-1, 1], block_frames at a time, so a whole track
+    is never held in memory. 16-bit WAV is read directly at its own rate;
+    anything else is decoded by ffmpeg at `rate`. Raises OSError when the
+    file cannot be decoded.
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            w = wave.open(path, "rb")
+        except (wave.Error, EOFError):
+            w = None
+        if w is not None:
+            if w.getsampwidth() == 2:
+                return w.getframerate(), _wav_chunks(w, channels, block_frames)
+            w.close()
+    if not ffmpeg_available():
+        raise OSError("ffmpeg not found")
+    return rate, _ffmpeg_chunks(path, rate, channels, block_frames)
+
+def _to_float(data, src_channels, channels):
+    pcm = np.frombuffer(data, dtype="<i2").reshape(-1, src_channels).astype(np.float32)
+    pcm *= 1.0 / 32768
+    if src_channels == channels:
+        return pcm
+    if channels == 1:
+        return pcm.mean(axis=1, keepdims=True)
+    return np.repeat(pcm[:, :1], channels, axis=1) if src_channels == 1 else pcm[:, :channels]
+
+def _wav_chunks(w, channels, block_frames):
+    src_channels = w.getnchannels()
+    try:
+        while True:
+            data = w.readframes(block_frames)
+            if not data:
+                break
+            yield _to_float(data, src_channels, channels)
+    finally:
+        w.close()
+
+def _ffmpeg_chunks(path, rate, channels, block_frames):
+    cmd = [FFMPEG, "-v", "error", "-nostdin", "-i", path, "-vn",
+           "-f", "s16le", "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(rate), "-"]
+    # no console window per decoded file on Windows
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+    block_bytes = block_frames * channels * 2
+    got_any = False
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % (channels * 2)]
+            got_any = True
+            yield _to_float(data, channels, channels)
+    finally:
+        # also reached when the consumer stops early: do not leave ffmpeg behind
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+    if not got_any and proc.returncode:
+        raise OSError(f"ffmpeg could not decode {path} (exit code {proc.returncode})")
+
+def _k_weighting(freqs, rate):
+    """Power response |H(f)|^2 of the BS.1770 K-weighting (shelf + high pass) at freqs."""
+    z = np.exp(-2j * np.pi * freqs / rate)
+
+    def biquad(b, a):
+        num = b[0] + b[1] * z + b[2] * z * z
+        den = a[0] + a[1] * z + a[2] * z * z
+        return np.abs(num / den) ** 2
+
+    # high shelf: +4 dB above ~1.5 kHz
+    A = 10 ** (4.0 / 40)
+    w0 = 2 * math.pi * 1500 / rate
+    cos, alpha = math.cos(w0), math.sin(w0) / (2 / math.sqrt(2))
+    shelf = biquad(
+        (A * ((A + 1) + (A - 1) * cos + 2 * math.sqrt(A) * alpha),
+         -2 * A * ((A - 1) + (A + 1) * cos),
+         A * ((A + 1) + (A - 1) * cos - 2 * math.sqrt(A) * alpha)),
+        ((A + 1) - (A - 1) * cos + 2 * math.sqrt(A) * alpha,
+         2 * ((A - 1) - (A + 1) * cos),
+         (A + 1) - (A - 1) * cos - 2 * math.sqrt(A) * alpha))
+    # high pass at 38 Hz
+    w0 = 2 * math.pi * 38 / rate
+    cos, alpha = math.cos(w0), math.sin(w0) / (2 * 0.5)
+    high_pass = biquad(((1 + cos) / 2, -(1 + cos), (1 + cos) / 2),
+                       (1 + alpha, -2 * cos, 1 - alpha))
+    return shelf * high_pass
+
+def measure_loudness(path):
+    """
+    (integrated loudness in LUFS, sample peak) of an audio file, or
+    (None, peak) for silence. Runs in a worker process.
+
+    Gated loudness as in ITU-R BS.1770: the track is cut into 100 ms
+    segments whose K-weighted mean square comes from one batched FFT per
+    decoded chunk (Parseval, with the filter applied as a power response),
+    400 ms blocks with 75% overlap are averages of four segments, and
+    blocks below -70 LUFS and then 10 LU under the ungated mean are dropped.
+    """
+    rate, chunks = open_pcm(path)
+    seg = max(1, rate // 10)
+    # the real FFT keeps half the spectrum: interior bins count twice
+    scale = np.full(seg // 2 + 1, 2.0)
+    scale[0] = 1.0
+    if seg % 2 == 0:
+        scale[-1] = 1.0
+    weight = _k_weighting(np.fft.rfftfreq(seg, 1.0 / rate), rate) * scale / (seg * seg)
+
+    energies = []
+    peak = 0.0
+    carry = None
+    for pcm in chunks:
+        if len(pcm):
+            peak = max(peak, float(np.abs(pcm).max()))
+        if carry is not None and len(carry):
+            pcm = np.concatenate((carry, pcm))
+        n = len(pcm) // seg
+        if n:
+            spec = np.fft.rfft(pcm[:n * seg].reshape(n, seg, -1), axis=1)
+            power = spec.real ** 2 + spec.imag ** 2
+            # channels are summed with weight 1 (front left/right)
+            energies.append(np.einsum("nkc,k->n", power, weight))
+        carry = pcm[n * seg:]
+
+    if not energies:
+        return None, peak
+    e = np.concatenate(energies)
+    blocks = np.convolve(e, np.full(4, 0.25), mode="valid") if len(e) >= 4 else np.array([e.mean()])
+    with np.errstate(divide="ignore"):
+        loud = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[loud > -70]
+    if not len(gated):
+        return None, peak
+    relative = -0.691 + 10 * math.log10(gated.mean()) - 10
+    gated = blocks[(loud > -70) & (loud > relative)]
+    return -0.691 + 10 * math.log10(gated.mean()), peak
+
+def compute_peaks(path, buckets=BUCKETS, window=256):
+    """
+    (n, 2) int8 array of per-bucket (min, max) sample values of an audio
+    file, n <= buckets. Runs in a worker process. The file is decoded as
+    low-rate mono in blocks; each block is folded into min/max per window
+    right away, so memory stays at a few values per second of audio.
+    """
+    _, chunks = open_pcm(path, rate=11025, channels=1)
+    mins, maxs = [], []
+    carry = None
+    for pcm in chunks:
+        x = pcm[:, 0]
+        if carry is not None and len(carry):
+            x = np.concatenate((carry, x))
+        n = len(x) // window
+        if n:
+            w = x[:n * window].reshape(n, window)
+            mins.append(w.min(axis=1))
+            maxs.append(w.max(axis=1))
+        carry = x[n * window:]
+    if carry is not None and len(carry):
+        mins.append(np.array([carry.min()]))
+        maxs.append(np.array([carry.max()]))
+    if not mins:
+        return np.zeros((0, 2), dtype=np.int8)
+
+    lo, hi = np.concatenate(mins), np.concatenate(maxs)
+    # windows -> buckets; the edges are strictly increasing since buckets <= windows
+    edges = np.linspace(0, len(lo), min(buckets, len(lo)) + 1).astype(np.intp)[:-1]
+    peaks = np.stack((np.minimum.reduceat(lo, edges), np.maximum.reduceat(hi, edges)), axis=1)
+    return np.clip(np.round(peaks * 127), -127, 127).astype(np.int8)
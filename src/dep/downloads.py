@@ -0,0 +1,378 @@
+import os, re, json, queue, tempfile, threading, itertools, subprocess
+import time as t
+
+from .settings import log_debug, log_error, log_info, settings, DEFAULT_YOUTUBE_CMD
+
+QUEUED    = "queued"
+RUNNING   = "running"
+DONE      = "done"
+FAILED    = "failed"
+CANCELLED = "cancelled"
+
+AUDIO_EXTS = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')
+
+_spotdl_downloaded = re.compile(r'Downloaded "(.+?)": ')
+
+_youtube_collection = re.compile(r'[?&]list=|/playlist\b|/@[^/]+/?$|/channel/')
+_spotify_collection = re.compile(r'open\.spotify\.com/(?:intl-[a-z]+/)?(album|playlist|artist)/')
+
+def is_collection(kind, url):
+    """True for playlist/album URLs that should be split into one job per item."""
+    pattern = _youtube_collection if kind == "youtube" else _spotify_collection
+    return bool(pattern.search(url))
+
+def expand_youtube(url):
+    """Video URLs of a YouTube playlist, without downloading anything."""
+    try:
+        import yt_dlp
+    except ImportError:
+        out = subprocess.run(["yt-dlp", "--flat-playlist", "--print", "url", url],
+                             capture_output=True, text=True, check=True).stdout
+        return [line.strip() for line in out.splitlines() if line.strip()]
+
+    with yt_dlp.YoutubeDL({"extract_flat": "in_playlist", "quiet": True,
+                           "no_warnings": True, "skip_download": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    urls = []
+    for entry in info.get("entries") or []:
+        if entry:
+            item_url = entry.get("url") or entry.get("webpage_url")
+            if item_url:
+                urls.append(item_url)
+    return urls
+
+def expand_spotify(url):
+    """Track URLs of a Spotify album/playlist/artist via `spotdl save`."""
+    fd, save_file = tempfile.mkstemp(suffix=".spotdl")
+    os.close(fd)
+    try:
+        subprocess.run(f'spotdl save {url} --save-file "{save_file}"', shell=True,
+                       capture_output=True, text=True, check=True)
+        with open(save_file, encoding="utf-8") as f:
+            songs = json.load(f)
+    finally:
+        os.remove(save_file)
+    return [song["url"] for song in songs if song.get("url")]
+
+class _Cancelled(Exception):
+    pass
+
+class YtDlpEngine:
+    """
+    In-process yt-dlp backend. Each worker thread keeps one YoutubeDL per
+    output directory and reuses it (extractors, HTTP session, cookies)
+    across jobs. Progress is reported through yt-dlp hooks.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    @staticmethod
+    def available():
+        try:
+            import yt_dlp
+        except ImportError:
+            return False
+        return True
+
+    def _instance(self, out_dir):
+        cache = getattr(self._local, "instances", None)
+        if cache is None:
+            cache = self._local.instances = {}
+        ydl = cache.get(out_dir)
+        if ydl is None:
+            import yt_dlp
+            # same result as DEFAULT_YOUTUBE_CMD: best audio converted to mp3 VBR 0
+            ydl = yt_dlp.YoutubeDL({
+                "format": "bestaudio/best",
+                "outtmpl": os.path.join(out_dir, "%(title)s.%(ext)s"),
+                "postprocessors": [{
+                    "key": "FFmpegExtractAudio",
+                    "preferredcodec": "mp3",
+                    "preferredquality": "0",
+                }],
+                "progress_hooks": [self._on_progress],
+                "postprocessor_hooks": [self._on_postprocess],
+                "post_hooks": [self._on_file],
+                "quiet": True,
+                "no_warnings": not settings.debug_mode,
+                "noprogress": True,
+            })
+            cache[out_dir] = ydl
+        return ydl
+
+    def _on_progress(self, d):
+        job = self._local.job
+        if job.cancelled:
+            raise _Cancelled()
+        if d.get("status") == "downloading":
+            total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            if total:
+                job.progress = d.get("downloaded_bytes", 0) / total
+                job.message = f"Downloading {int(job.progress * 100)}%"
+        elif d.get("status") == "finished":
+            job.message = "Converting..."
+
+    def _on_file(self, filepath):
+        # final path after conversion/move, reported once per downloaded file
+        self._local.job.files.append(os.path.abspath(filepath))
+
+    def _on_postprocess(self, d):
+        job = self._local.job
+        if job.cancelled:
+            raise _Cancelled()
+        if d.get("status") == "started":
+            job.message = f"{d.get('postprocessor', 'Processing')}..."
+
+    def download(self, job):
+        """Download job.url; returns (returncode, error text)."""
+        self._local.job = job
+        try:
+            ydl = self._instance(job.out_dir)
+            retcode = ydl.download([job.url])
+            return retcode, ""
+        except _Cancelled:
+            return 1, "Cancelled"
+        except Exception as e:
+            if isinstance(e.__context__, _Cancelled) or job.cancelled:
+                return 1, "Cancelled"
+            return 1, str(e)
+        finally:
+            self._local.job = None
+
+ytdlp_engine = YtDlpEngine()
+
+class DownloadJob:
+    """One URL to download with yt-dlp ("youtube") or spotdl ("spotify")."""
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, url, out_dir, playlist=None, on_done=None, parent=None):
+        self.id = next(self._ids)
+        self.parent = parent
+        self.items = []
+        self.kind = kind
+        self.url = url
+        self.out_dir = out_dir
+        self.playlist = playlist
+        self.on_done = on_done
+        self.state = QUEUED
+        self.message = "Queued"
+        self.files = []
+        self.stdout = ""
+        self.stderr = ""
+        self.returncode = None
+        self.process = None
+        self.progress = 0.0
+        self.cancelled = False
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def command(self):
+        template = settings.youtube_cmd if self.kind == "youtube" else settings.spotify_cmd
+        return template.replace("{url}", self.url).replace("{out}", self.out_dir)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.state == QUEUED:
+            self.state = CANCELLED
+            self.message = "Cancelled"
+        elif self.process is not None:
+            self.message = "Cancelling..."
+            self.process.terminate()
+
+    def in_process(self):
+        # custom commands keep going through the CLI
+        return (self.kind == "youtube" and settings.youtube_in_process
+                and settings.youtube_cmd == DEFAULT_YOUTUBE_CMD and ytdlp_engine.available())
+
+    def run(self):
+        if self.parent is None and is_collection(self.kind, self.url):
+            # playlists/albums are only expanded here, the items become their own jobs
+            self.message = "Reading playlist..."
+            self.items = expand_youtube(self.url) if self.kind == "youtube" else expand_spotify(self.url)
+            self.returncode = 0
+            return
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.in_process():
+            if settings.debug_mode:
+                log_debug(f"Download job {self.id} (youtube) with the built-in yt-dlp")
+            # files are collected by the engine's post hook
+            self.returncode, self.stderr = ytdlp_engine.download(self)
+            return
+
+        command = self.command()
+        reports_paths = self.kind == "youtube" and self._is_ytdlp(command)
+        if reports_paths:
+            # yt-dlp prints the final path of every file after it is moved in place
+            command += " --print after_move:filepath --no-simulate"
+
+        # directory scans are only the fallback for commands we cannot read paths from
+        initial_files = None
+        if self.kind == "youtube" and not reports_paths:
+            initial_files = set(os.listdir(self.out_dir))
+        start_ts = t.time()
+
+        self._run_command(command)
+        if self.cancelled or self.returncode != 0:
+            return
+
+        if reports_paths:
+            files = [line.strip() for line in self.stdout.splitlines()]
+            self.files = [os.path.abspath(f) for f in files if f and os.path.isfile(f)]
+        elif self.kind == "spotify":
+            self.files = self._spotdl_files()
+            if self.files is None:
+                self.files = self._files_since(start_ts)
+        else:
+            new_files = set(os.listdir(self.out_dir)) - initial_files
+            self.files = [os.path.join(self.out_dir, fn) for fn in sorted(new_files)
+                          if fn.lower().endswith(AUDIO_EXTS)]
+
+    @staticmethod
+    def _is_ytdlp(command):
+        exe = command.strip().split(" ", 1)[0].strip('"')
+        return os.path.basename(exe).lower() in ("yt-dlp", "yt-dlp.exe")
+
+    def _spotdl_files(self):
+        """
+        Files named in spotdl's "Downloaded" lines, or None if a name cannot
+        be matched to a file (custom output templates, sanitized names).
+        """
+        names = _spotdl_downloaded.findall(self.stdout + self.stderr)
+        if not names:
+            return None if "Downloaded" in self.stdout else []
+        files = []
+        for name in names:
+            for ext in AUDIO_EXTS:
+                path = os.path.join(self.out_dir, name + ext)
+                if os.path.isfile(path):
+                    files.append(os.path.abspath(path))
+                    break
+            else:
+                return None
+        return files
+
+    def _files_since(self, start_ts):
+        # legacy fallback: anything written to the download folder since the start
+        files = []
+        for fn in sorted(os.listdir(self.out_dir)):
+            if not fn.lower().endswith(AUDIO_EXTS):
+                continue
+            path = os.path.join(self.out_dir, fn)
+            try:
+                if os.path.getmtime(path) >= start_ts:
+                    files.append(path)
+            except OSError:
+                continue
+        return files
+
+    def _run_command(self, command):
+        if settings.debug_mode:
+            log_debug(f"Download job {self.id} ({self.kind}) with command: {command}")
+
+        # spotdl is resolved through the shell like before, yt-dlp is started directly
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            shell=self.kind == "spotify", text=True
+        )
+        if self.cancelled:
+            self.process.terminate()
+        self.stdout, self.stderr = self.process.communicate()
+        self.returncode = self.process.returncode
+        self.process = None
+
+class DownloadManager:
+    """
+    Runs download jobs on at most settings.max_downloads worker threads.
+    Jobs wait in a FIFO queue; each keeps its own state for the downloads panel.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._jobs = []
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            self._jobs.append(job)
+            self._queue.put(job)
+            self._workers = [w for w in self._workers if w.is_alive()]
+            if len(self._workers) < max(1, int(settings.max_downloads)):
+                w = threading.Thread(target=self._work, daemon=True)
+                w.start()
+                self._workers.append(w)
+        if settings.debug_mode:
+            log_info(f"Download job {job.id} queued: {job.url}")
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def get(self, job_id):
+        with self._lock:
+            return next((j for j in self._jobs if j.id == job_id), None)
+
+    def clear_finished(self):
+        with self._lock:
+            self._jobs = [j for j in self._jobs if not j.finished]
+
+    def cancel_all(self):
+        for job in self.jobs():
+            if not job.finished:
+                job.cancel()
+
+    def _work(self):
+        while True:
+            try:
+                # idle workers exit so the pool shrinks back when the queue is empty
+                job = self._queue.get(timeout=5)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._workers.remove(threading.current_thread())
+                        return
+                continue
+            if job.cancelled:
+                job.state = CANCELLED
+                job.message = "Cancelled"
+                self._finish(job)
+                continue
+            job.state = RUNNING
+            job.message = "Downloading..."
+            try:
+                job.run()
+                if job.cancelled:
+                    job.state = CANCELLED
+                    job.message = "Cancelled"
+                elif job.returncode != 0:
+                    job.state = FAILED
+                    job.message = "Failed"
+                elif job.items:
+                    job.state = DONE
+                    job.message = f"Split into {len(job.items)} downloads"
+                    for url in job.items:
+                        self.submit(DownloadJob(job.kind, url, job.out_dir, job.playlist,
+                                                job.on_done, parent=job))
+                else:
+                    job.state = DONE
+                    job.message = f"Done ({len(job.files)} files)"
+            except Exception as e:
+                job.state = FAILED
+                job.message = f"Failed: {e}"
+                job.stderr = getattr(e, "stderr", None) or str(e)
+                log_error(f"Download job {job.id} failed: {e}", e)
+            self._finish(job)
+
+    def _finish(self, job):
+        if settings.debug_mode:
+            log_info(f"Download job {job.id} {job.state}: {job.url}")
+        if job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                log_error(f"Download job {job.id} callback failed: {e}", e)
+
+download_manager = DownloadManager()
@@ -0,0 +1,216 @@
+import os, mmap, struct, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from .settings import log_debug, log_error, settings
+from .metadata import metadata_index, _file_key
+
+_block = 8 * 1024 * 1024
+
+def _id3v2_size(head):
+    # 10-byte header, syncsafe size, plus a 10-byte footer when flagged
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = (head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14 | (head[8] & 0x7f) << 7 | (head[9] & 0x7f)
+    return 10 + size + (10 if head[5] & 0x10 else 0)
+
+def _flac_audio_start(mm, start):
+    # "fLaC" then metadata blocks: 1 bit last-block flag, 7 bits type, 24 bits length
+    pos = start + 4
+    while pos + 4 <= len(mm):
+        header = mm[pos]
+        length = int.from_bytes(mm[pos + 1:pos + 4], "big")
+        pos += 4 + length
+        if header & 0x80:
+            return pos
+    return start + 4
+
+def _chunk_payload(mm, start, size_fmt, header_len, name):
+    # first chunk/box called name in a RIFF (WAV) or ISO (MP4/M4A) container
+    pos = start
+    while pos + header_len <= len(mm):
+        if size_fmt == "<I":
+            cid, size = mm[pos:pos + 4], struct.unpack("<I", mm[pos + 4:pos + 8])[0]
+            body, end = pos + 8, pos + 8 + size + (size & 1)
+        else:
+            size, cid = struct.unpack(">I", mm[pos:pos + 4])[0], mm[pos + 4:pos + 8]
+            body = pos + 8
+            if size == 1:
+                size = struct.unpack(">Q", mm[pos + 8:pos + 16])[0]
+                body = pos + 16
+            elif size == 0:
+                size = len(mm) - pos
+            end = pos + size
+            if size < 8:
+                break
+        if cid == name:
+            return body, min(end, len(mm))
+        pos = end
+    return None
+
+def audio_span(mm):
+    """(start, end) byte range of the audio payload, without tag blocks."""
+    start, end = 0, len(mm)
+    head = mm[:12]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return _chunk_payload(mm, 12, "<I", 8, b"data") or (start, end)
+    if head[4:8] == b"ftyp":
+        return _chunk_payload(mm, 0, ">I", 8, b"mdat") or (start, end)
+
+    start = _id3v2_size(head[:10])
+    if mm[start:start + 4] == b"fLaC":
+        return _flac_audio_start(mm, start), end
+    # trailing tags: ID3v1 (128 bytes) and APEv2 (32-byte footer + items)
+    if end - start >= 128 and mm[end - 128:end - 125] == b"TAG":
+        end -= 128
+    if end - start >= 32 and mm[end - 32:end - 24] == b"APETAGEX":
+        size, flags = struct.unpack("<II", mm[end - 20:end - 16] + mm[end - 12:end - 8])
+        end -= size + (32 if flags & 0x80000000 else 0)
+    return start, max(start, end)
+
+def hash_audio(path):
+    """
+    blake2b hex digest of the audio payload of path: retagging or renaming
+    keeps it. None for a file without audio (empty, or only tags): those
+    would all hash the same.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = audio_span(mm)
+            if start >= end:
+                return None
+            view = memoryview(mm)
+            try:
+                # hashlib releases the GIL on large updates, so worker threads
+                # hash in parallel and the disk sets the pace
+                for pos in range(start, end, _block):
+                    h.update(view[pos:min(pos + _block, end)])
+            finally:
+                view.release()
+    return h.hexdigest()
+
+class DuplicateDetector:
+    """
+    Content hashes of library files, persisted in the metadata database
+    keyed by path + size + mtime, so each file is read once until it
+    changes. Hashing runs on a thread pool.
+    """
+    def __init__(self, index, workers=None):
+        self.index = index
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = None
+        self._closed = False
+
+    def _executor(self):
+        with self._lock:
+            if self._closed:
+                return None
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max(1, int(self.workers or settings.hash_workers)),
+                                                thread_name_prefix="hash")
+            return self._pool
+
+    def hash(self, path, flush=True):
+        """
+        Cached or freshly computed audio hash of path, None if it cannot be
+        read or has no audio. flush=False leaves the commit to the batch.
+        """
+        key = _file_key(path)
+        if key is None:
+            return None
+        digest = self.index.get_hash(path, key)
+        if digest is not None:
+            return digest
+        try:
+            digest = hash_audio(key[0])
+        except (OSError, ValueError) as e:
+            log_error(f"Cannot hash {path}: {e}", e)
+            return None
+        if digest is None:
+            return None
+        self.index.put_hash(path, digest, key)
+        if flush:
+            self.index.flush()
+        if settings.debug_mode:
+            log_debug(f"Hashed {path}: {digest}")
+        return digest
+
+    def hash_all(self, files, progress=None, cancelled=None):
+        """
+        {abs path: hash} for files, hashing the ones not cached in parallel.
+        progress(done, total) is called on the calling thread as files finish.
+        """
+        files = list(dict.fromkeys(os.path.abspath(f) for f in files))
+        total, done = len(files), 0
+        result = {}
+        pool = self._executor()
+        if pool is None:
+            return result
+        futures = {pool.submit(self._hash_unless, f, cancelled): f for f in files}
+        for future in futures:
+            try:
+                digest = future.result()
+            except CancelledError:
+                break  # closing
+            if digest is not None:
+                result[futures[future]] = digest
+            done += 1
+            if progress is not None:
+                progress(done, total)
+        self.index.flush()
+        return result
+
+    def _hash_unless(self, path, cancelled):
+        if cancelled is not None and cancelled():
+            return None
+        return self.hash(path, flush=False)
+
+    def find(self, files, progress=None, cancelled=None):
+        """Groups of two or more distinct files with the same audio, largest groups first."""
+        groups = {}
+        for path, digest in self.hash_all(files, progress, cancelled).items():
+            groups.setdefault(digest, []).append(path)
+        return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+    def matches(self, path, library):
+        """Files in library (a set of absolute paths), other than path, with the same audio as path."""
+        digest = self.hash(path)
+        if digest is None:
+            return []
+        path = os.path.abspath(path)
+        found = []
+        for other in self.index.paths_with_hash(digest):
+            # a stored hash may be stale: only trust it if the file did not change
+            if other != path and other in library and self.index.get_hash(other) == digest:
+                found.append(other)
+        return found
+
+    def check(self, path, library, callback):
+        """matches(path, library) on the pool; callback(matches) is called from a pool thread."""
+        pool = self._executor()
+        if pool is None:
+            return
+        def run():
+            try:
+                found = self.matches(path, library)
+            except Exception as e:
+                log_error(f"Duplicate check failed for {path}: {e}", e)
+                found = []
+            callback(found)
+        try:
+            pool.submit(run)
+        except RuntimeError:
+            pass  # shut down while closing
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.index.flush()
+
+duplicate_detector = DuplicateDetector(metadata_index)
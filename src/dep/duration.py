@@ -0,0 +1,84 @@
+import os, threading, wave
+
+from .settings import log_debug, log_error, log_info, settings
+
+class DurationService:
+    """
+    Track length lookup that never decodes the whole file when a header is
+    good enough. Order: cached value -> metadata index -> container header
+    (mutagen) -> streaming decode as a last resort. Results are cached per file
+    (path + size + mtime) for the whole session.
+    """
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _key(self, file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return os.path.abspath(file_path), st.st_size, st.st_mtime_ns
+
+    def probe(self, file_path, meta=None):
+        """Length of file_path in seconds (0 if it cannot be determined)."""
+        key = self._key(file_path)
+        if key is not None:
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+
+        length = 0
+        if meta and meta.get("duration"):
+            length = float(meta["duration"])
+        if not length:
+            length = self._header_length(file_path)
+        if not length:
+            length = self._decode_length(file_path)
+
+        if key is not None and length:
+            with self._lock:
+                self._cache[key] = length
+        return length
+
+    def correct(self, file_path, length):
+        """Replace a cached length that turned out to be wrong during playback."""
+        key = self._key(file_path)
+        if key is None:
+            return
+        with self._lock:
+            self._cache[key] = length
+        if settings.debug_mode:
+            log_debug(f"Duration corrected to {length:.1f}s: {file_path}")
+
+    def _header_length(self, file_path):
+        from mutagen import File as MutagenFile
+        try:
+            audio = MutagenFile(file_path)
+            if audio is not None and audio.info and audio.info.length:
+                return float(audio.info.length)
+        except Exception as e:
+            if settings.debug_mode:
+                log_debug(f"No usable length in header of {file_path}: {e}")
+        return 0
+
+    def _decode_length(self, file_path):
+        if file_path.lower().endswith(".wav"):
+            try:
+                with wave.open(file_path, "rb") as w:
+                    return w.getnframes() / float(w.getframerate())
+            except Exception:
+                pass
+        # headers are missing or unreadable: fall back to decoding the file,
+        # streamed as low-rate mono so only one block is in memory at a time
+        try:
+            from .decode import open_pcm
+            if settings.debug_mode:
+                log_info(f"Decoding {file_path} to measure its length")
+            rate, chunks = open_pcm(file_path, rate=11025, channels=1)
+            return sum(len(pcm) for pcm in chunks) / float(rate)
+        except Exception as e:
+            log_error(f"Cannot determine length of {file_path}: {e}", e)
+            return 0
+
+duration_service = DurationService()
@@ -0,0 +1,195 @@
+import os, queue, sqlite3, threading
+
+from .settings import log_debug, log_error, log_info, settings
+from .downloads import AUDIO_EXTS
+
+# its own file: a long scan must not wait on (or block) the metadata cache's writes
+_library_index_path = 'library_index.db'
+
+class LibraryScanner:
+    """
+    Incremental index of the audio files under the library roots (the
+    download folder plus settings.library_roots). Directory mtimes are
+    stored, so a folder whose entries were not added, removed or renamed is
+    not listed again; files of re-listed folders are compared by size and
+    mtime and only new or changed ones are reported. A reported file is
+    only stored once record() is called for it (after it was imported), so
+    files that could not be imported are reported again by the next scan.
+    """
+    def __init__(self, path=_library_index_path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS library_dirs (
+                path   TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime  INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS library_files (
+                path  TEXT PRIMARY KEY,
+                dir   TEXT NOT NULL,
+                size  INTEGER NOT NULL,
+                mtime INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS library_files_dir ON library_files (dir)")
+        self._conn.commit()
+
+    def roots(self):
+        roots = [settings.default_download_path] + list(settings.library_roots)
+        return [os.path.abspath(r) for r in roots if r and os.path.isdir(r)]
+
+    def scan(self, roots=None):
+        """Rescan the roots; returns the audio files that are new or changed and not recorded yet."""
+        with self._lock:
+            dirs = {}
+            children = {}
+            for path, parent, mtime in self._conn.execute("SELECT path, parent, mtime FROM library_dirs"):
+                dirs[path] = mtime
+                children.setdefault(parent, []).append(path)
+
+            changed = []
+            seen_dirs = set()
+            stack = list(roots or self.roots())
+            with self._conn:
+                while stack:
+                    d = stack.pop()
+                    if d in seen_dirs:
+                        continue
+                    try:
+                        mtime = os.stat(d).st_mtime_ns
+                    except OSError:
+                        continue
+                    seen_dirs.add(d)
+                    if dirs.get(d) == mtime:
+                        # entries unchanged: skip the listing, only walk the known subfolders
+                        stack.extend(children.get(d, ()))
+                        continue
+                    stack.extend(self._scan_dir(d, mtime, changed))
+
+                # folders that disappeared since the last scan
+                gone = [p for p in dirs if p not in seen_dirs]
+                for p in gone:
+                    self._conn.execute("DELETE FROM library_dirs WHERE path = ?", (p,))
+                    self._conn.execute("DELETE FROM library_files WHERE dir = ?", (p,))
+
+        if settings.debug_mode:
+            log_debug(f"Library scan: {len(seen_dirs)} folders, {len(changed)} new/changed files")
+        return changed
+
+    def _scan_dir(self, d, mtime, changed):
+        known = {path: (size, mt) for path, size, mt in self._conn.execute(
+            "SELECT path, size, mtime FROM library_files WHERE dir = ?", (d,))}
+        subdirs = []
+        present = set()
+        unrecorded = False
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.name.lower().endswith(AUDIO_EXTS):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    present.add(entry.path)
+                    if known.get(entry.path) != (st.st_size, st.st_mtime_ns):
+                        changed.append(entry.path)
+                        unrecorded = True
+        except OSError as e:
+            log_error(f"Cannot scan {d}: {e}", e)
+            return []
+
+        for path in known:
+            if path not in present:
+                self._conn.execute("DELETE FROM library_files WHERE path = ?", (path,))
+        if not unrecorded:
+            # with files still to record, the folder must be listed again next time
+            self._conn.execute("INSERT OR REPLACE INTO library_dirs (path, parent, mtime) VALUES (?, ?, ?)",
+                               (d, os.path.dirname(d), mtime))
+        return subdirs
+
+    def record(self, files):
+        """Store files reported by scan() once they were imported."""
+        rows = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            rows.append((path, os.path.dirname(path), st.st_size, st.st_mtime_ns))
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO library_files (path, dir, size, mtime) VALUES (?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            # the files are reported again by the next scan
+            log_error(f"Failed to record {len(rows)} library files: {e}", e)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class LibraryWatcher:
+    """
+    Polls the library roots in the background. New files are passed to
+    on_files (from the scan thread), or queued on `results` without it.
+    """
+    def __init__(self, scanner, on_files=None):
+        self.scanner = scanner
+        self.on_files = on_files
+        self.results = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._running > 0 or not self.results.empty()
+
+    def scan_now(self):
+        with self._lock:
+            self._running += 1
+        threading.Thread(target=self._scan, daemon=True).start()
+
+    def _scan(self):
+        try:
+            files = self.scanner.scan()
+            if files:
+                if self.on_files is not None:
+                    self.on_files(files)
+                else:
+                    self.results.put(files)
+        except Exception as e:
+            log_error(f"Library scan failed: {e}", e)
+        finally:
+            with self._lock:
+                self._running = max(0, self._running - 1)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if settings.debug_mode:
+            log_info(f"Watching library every {settings.library_watch_interval}s")
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                self._running += 1
+            self._scan()
+            self._stop.wait(max(1, int(settings.library_watch_interval)))
+
+    def stop(self):
+        self._stop.set()
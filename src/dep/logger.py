@@ -0,0 +1,142 @@
+import os, sys, queue, threading
+from datetime import datetime
+from termcolor import colored
+
+DEBUG = 10
+INFO  = 20
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "error": ERROR}
+
+_colors = {DEBUG: 'green', INFO: 'white', ERROR: 'red'}
+
+class AsyncLogger:
+    """
+    Queue-backed log writer. Callers only format a record and put it on a
+    bounded queue; a daemon thread batches records to the console and the
+    log files. When the queue is full new records are dropped (and counted)
+    instead of blocking the caller. Files are rotated by size and kept
+    across runs.
+    """
+    def __init__(self, log_dir, header="", max_bytes=5 * 1024 * 1024, backups=3, max_queue=10000):
+        self.log_dir = log_dir
+        self.header = header
+        self.level = DEBUG
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self.debug_file = os.path.join(log_dir, 'debug_log.txt')
+        self.error_file = os.path.join(log_dir, 'error_log.txt')
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def log(self, level, msg, err=None):
+        if level < self.level:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((level, datetime.now(), msg, err))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        for name, path in (("debug", self.debug_file), ("error", self.error_file)):
+            self._open(name, path)
+            self._files[name].write(f"{name.capitalize()} log {datetime.now():%Y-%m-%d %H:%M:%S}\n{self.header}\n")
+
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                # never let the writer die; the console still gets the message
+                print(f"Logging failed: {e}", file=sys.stderr)
+
+    def _write(self, batch):
+        console = []
+        debug = []
+        errors = []
+        done = []
+        for record in batch:
+            if isinstance(record, threading.Event):
+                done.append(record)
+                continue
+            level, ts, msg, err = record
+            now = ts.strftime("%H:%M:%S")
+            if level >= ERROR:
+                console.append(" ".join((colored(now, 'white'), colored(msg, 'red'),
+                                         colored(" | Error type: ", 'blue'), colored(type(err), 'white'))))
+                line = f"{now}: {msg} | Error type: {type(err)}\n"
+                errors.append(line)
+            else:
+                console.append(" ".join((colored(now, 'white'), colored(msg, _colors[level]))))
+                line = f"{now}: {msg}\n"
+            debug.append(line)
+
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            debug.append(f"{datetime.now():%H:%M:%S}: {dropped} log records dropped (queue full)\n")
+        if console:
+            print("\n".join(console), flush=True)
+        if debug:
+            self._append("debug", self.debug_file, debug)
+        if errors:
+            self._append("error", self.error_file, errors)
+        for event in done:
+            event.set()
+
+    def _open(self, name, path):
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            self._rotate(path)
+        self._files[name] = open(path, 'a', encoding='utf-8')
+
+    def _append(self, name, path, lines):
+        f = self._files[name]
+        f.writelines(lines)
+        f.flush()
+        if f.tell() >= self.max_bytes:
+            f.close()
+            self._rotate(path)
+            self._files[name] = open(path, 'a', encoding='utf-8')
+
+    def _rotate(self, path):
+        # debug_log.txt -> debug_log.1.txt -> ... -> debug_log.<backups>.txt
+        base, ext = os.path.splitext(path)
+        for i in range(self.backups, 0, -1):
+            src = path if i == 1 else f"{base}.{i - 1}{ext}"
+            if os.path.exists(src):
+                os.replace(src, f"{base}.{i}{ext}")
+
+    def flush(self, timeout=2.0):
+        """Wait until everything queued so far is written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        event = threading.Event()
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            return
+        event.wait(timeout)
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            try:
+                f.close()
+            except Exception:
+                pass
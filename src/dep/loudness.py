@@ -0,0 +1,155 @@
+import os, threading, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .settings import log_debug, log_error, log_info, settings
+from .metadata import metadata_index, _file_key
+
+class LoudnessAnalyzer:
+    """
+    Measures the loudness of library files in a process pool (decoding and
+    FFTs are CPU bound) and keeps the result per file in the metadata
+    database, keyed like the tags by path + size + mtime: only new or
+    changed files are analysed, and an interrupted run resumes where it
+    stopped. Files that cannot be decoded are stored too, so they are not
+    retried until they change.
+    """
+    def __init__(self, index, workers=None):
+        self.index = index
+        self.workers = workers
+        self.total = 0
+        self.done = 0
+        self._files = deque()
+        self._running = 0  # submitted and not finished
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+        self._closed = False
+        self._warned = False
+        self._gains = {}  # path -> linear gain, for the session
+
+    def analyze(self, files):
+        """Queue files; those with an up to date measurement are skipped."""
+        if not settings.normalize_volume:
+            return
+        with self._cond:
+            self._files.extend(files)
+            self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._feed, daemon=True)
+                self._thread.start()
+
+    def _feed(self):
+        # runs the cache lookups (one stat + one read per file) off the Tk thread
+        # and keeps at most two files per worker in flight, so closing is quick
+        # the worker function lives in the app-free decode module, so the
+        # spawned processes do not import Tk, the settings or the databases
+        from .decode import ffmpeg_available, measure_loudness
+        has_ffmpeg = ffmpeg_available()
+        workers = max(1, int(self.workers or settings.loudness_workers))
+        in_flight = threading.Semaphore(2 * workers)
+        while True:
+            with self._cond:
+                while not self._files and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path = self._files.popleft()
+            key = _file_key(path)
+            if key is None or self.index.get_loudness(path, key) is not None:
+                continue
+            if not has_ffmpeg and not path.lower().endswith(".wav"):
+                if not self._warned:
+                    self._warned = True
+                    log_info("ffmpeg not found: loudness is only measured for WAV files")
+                continue
+            in_flight.acquire()
+            with self._cond:
+                if self._closed:
+                    return
+                if self._pool is None:
+                    # spawn: forking a process that runs Tk and threads is not safe
+                    self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+                try:
+                    future = self._pool.submit(measure_loudness, path)
+                except Exception as e:
+                    # a worker died (BrokenProcessPool): start a fresh pool for the next file
+                    log_error(f"Loudness pool failed, restarting it: {e}", e)
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                    in_flight.release()
+                    continue
+                self.total += 1
+                self._running += 1
+            future.add_done_callback(lambda f, path=path, key=key: self._finished(f, path, key, in_flight))
+
+    def _finished(self, future, path, key, in_flight):
+        in_flight.release()
+        try:
+            self._store(future, path, key)
+        finally:
+            with self._cond:
+                self._running -= 1
+                idle = self._running == 0 and not self._closed and not self._files
+            if idle:
+                # end of a batch: commit, so no write transaction stays open (close() flushes by itself)
+                self.index.flush()
+                if settings.debug_mode:
+                    log_info(f"Loudness analysis finished: {self.done} files")
+
+    def _store(self, future, path, key):
+        if future.cancelled():
+            return
+        try:
+            lufs, peak = future.result()
+        except BrokenProcessPool as e:
+            # not the file's fault: leave it for the next run
+            log_error(f"Loudness analysis of {path} interrupted: {e}", e)
+            self.done += 1
+            return
+        except Exception as e:
+            log_error(f"Loudness analysis failed for {path}: {e}", e)
+            lufs, peak = None, 0.0
+        try:
+            self.index.put_loudness(path, lufs, peak, key)
+        except Exception as e:
+            log_error(f"Failed to cache loudness for {path}: {e}", e)
+        self._gains.pop(key[0], None)
+        self.done += 1
+        if settings.debug_mode:
+            log_debug(f"Loudness {lufs if lufs is None else round(lufs, 1)} LUFS, peak {peak:.2f}: {path}")
+
+    def gain(self, song):
+        """Linear volume factor that brings song to settings.target_loudness (1.0 if unknown)."""
+        if not settings.normalize_volume:
+            return 1.0
+        path = os.path.abspath(song["file"])
+        gain = self._gains.get(path)
+        if gain is None:
+            measured = self.index.get_loudness(path)
+            if measured is None or measured[0] is None:
+                return 1.0
+            lufs, peak = measured
+            gain = 10 ** ((float(settings.target_loudness) - lufs) / 20)
+            if peak > 0:
+                gain = min(gain, 1.0 / peak)
+            # the mixer volume cannot go above 1: quiet tracks play at the user volume
+            gain = min(gain, 1.0)
+            self._gains[path] = gain
+        return gain
+
+    def reset_gains(self):
+        """Forget computed gains after the target changed."""
+        self._gains.clear()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.index.flush()
+
+loudness_analyzer = LoudnessAnalyzer(metadata_index)
@@ -0,0 +1,272 @@
+import os, json, sqlite3, hashlib, threading
+
+from .settings import log_debug, log_error, settings
+
+_metadata_db_path = 'metadata.db'
+_schema_version = 5
+_commit_every = 200
+
+def extract_metadata(file_path):
+    """
+    Read ID3 tags (title, artist, album, duration, cover, lyrics)
+    Returns a metadata dict (might be empty).
+    """
+    # mutagen is only imported once the first file is read
+    from mutagen import File as MutagenFile
+    from mutagen.id3 import ID3
+    meta = {}
+    try:
+        audio = MutagenFile(file_path, easy=True)
+        tags  = audio.tags or {}
+        meta["title"]    = tags.get("title",   [os.path.basename(file_path)])[0]
+        meta["artist"]   = tags.get("artist",  ["Unknown Artist"])[0]
+        meta["album"]    = tags.get("album",   [""])[0]
+        meta["duration"] = int(audio.info.length) if audio.info else 0
+
+        # now load ID3 frames for cover & lyrics
+        id3 = ID3(file_path)
+        pic = id3.getall("APIC")
+        if pic:
+            meta["cover_data"] = pic[0].data
+        usl = id3.getall("USLT")
+        if usl:
+            meta["lyrics"] = usl[0].text
+        tcon = id3.getall("TCON")
+        if tcon:
+            meta["genre"] = tcon[0].text
+    except Exception:
+        pass
+
+    return meta
+
+def _file_key(file_path):
+    """Absolute path, size and mtime (ns) of a file, or None if it is missing."""
+    path = os.path.abspath(file_path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_size, st.st_mtime_ns
+
+class MetadataIndex:
+    """
+    Persistent metadata cache (SQLite) keyed by absolute path + size + mtime.
+    A lookup is a single primary-key read; files are only re-extracted when
+    they changed on disk. Cover art is stored once per image, keyed by its
+    sha1: metadata carries only that key ("cover"), and the bytes are read
+    with cover() when a card shows them.
+    """
+    def __init__(self, path=_metadata_db_path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tracks (
+                    path   TEXT PRIMARY KEY,
+                    size   INTEGER NOT NULL,
+                    mtime  INTEGER NOT NULL,
+                    meta   TEXT NOT NULL,
+                    cover  BLOB
+                )
+            """)
+        if version < 2:
+            # lufs is NULL for silence and files that could not be decoded
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS loudness (
+                    path   TEXT PRIMARY KEY,
+                    size   INTEGER NOT NULL,
+                    mtime  INTEGER NOT NULL,
+                    lufs   REAL,
+                    peak   REAL NOT NULL
+                )
+            """)
+        if version < 3:
+            # blake2b of the audio payload (tags skipped), for duplicate detection
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    path   TEXT PRIMARY KEY,
+                    size   INTEGER NOT NULL,
+                    mtime  INTEGER NOT NULL,
+                    hash   TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash)")
+        if version < 4:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS covers (
+                    hash   TEXT PRIMARY KEY,
+                    data   BLOB NOT NULL
+                )
+            """)
+            # move the per-track copies into covers, one row at a time
+            rowids = [r[0] for r in self._conn.execute("SELECT rowid FROM tracks WHERE cover IS NOT NULL")]
+            for rowid in rowids:
+                meta, cover = self._conn.execute("SELECT meta, cover FROM tracks WHERE rowid = ?", (rowid,)).fetchone()
+                meta = json.loads(meta)
+                meta["cover"] = self._store_cover(cover)
+                self._conn.execute("UPDATE tracks SET meta = ?, cover = NULL WHERE rowid = ?", (json.dumps(meta), rowid))
+        if version < 5:
+            # the library scan index moved to its own file (dep/library.py)
+            self._conn.execute("DROP TABLE IF EXISTS library_dirs")
+            self._conn.execute("DROP TABLE IF EXISTS library_files")
+        self._conn.execute(f"PRAGMA user_version={_schema_version}")
+        self._conn.commit()
+
+    def get(self, file_path):
+        """Cached metadata for file_path, or None if missing or stale."""
+        key = _file_key(file_path)
+        if key is None:
+            return None
+        path, size, mtime = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, meta FROM tracks WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+        return json.loads(row[2])
+
+    def cover(self, cover_key):
+        """Cover image bytes for the "cover" key of some metadata, or None."""
+        if not cover_key:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM covers WHERE hash = ?", (cover_key,)).fetchone()
+        return row[0] if row else None
+
+    def _store_cover(self, data):
+        # called with the lock held (or during migration); the same image is stored once
+        cover_key = hashlib.sha1(data).hexdigest()
+        self._conn.execute("INSERT OR IGNORE INTO covers (hash, data) VALUES (?, ?)", (cover_key, data))
+        return cover_key
+
+    def _wrote(self):
+        # called with the lock held: batch commits so a first scan of a large
+        # library is not fsync bound
+        self._pending += 1
+        if self._pending >= _commit_every:
+            self._conn.commit()
+            self._pending = 0
+
+    def put(self, file_path, meta, key=None):
+        """Store meta for file_path; returns it with the cover bytes replaced by their key."""
+        key = key or _file_key(file_path)
+        data = dict(meta)
+        cover = data.pop("cover_data", None)
+        if key is None:
+            return data
+        path, size, mtime = key
+        with self._lock:
+            if cover:
+                data["cover"] = self._store_cover(cover)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tracks (path, size, mtime, meta, cover) VALUES (?, ?, ?, ?, NULL)",
+                (path, size, mtime, json.dumps(data))
+            )
+            self._wrote()
+        return data
+
+    def get_loudness(self, file_path, key=None):
+        """(lufs, peak) measured for file_path, or None if missing or stale."""
+        key = key or _file_key(file_path)
+        if key is None:
+            return None
+        path, size, mtime = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, lufs, peak FROM loudness WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+        return row[2], row[3]
+
+    def put_loudness(self, file_path, lufs, peak, key=None):
+        key = key or _file_key(file_path)
+        if key is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO loudness (path, size, mtime, lufs, peak) VALUES (?, ?, ?, ?, ?)",
+                (*key, lufs, peak)
+            )
+            self._wrote()
+
+    def get_hash(self, file_path, key=None):
+        """Audio hash stored for file_path, or None if missing or stale."""
+        key = key or _file_key(file_path)
+        if key is None:
+            return None
+        path, size, mtime = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, hash FROM hashes WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+        return row[2]
+
+    def put_hash(self, file_path, digest, key=None):
+        key = key or _file_key(file_path)
+        if key is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                (*key, digest)
+            )
+            self._wrote()
+
+    def paths_with_hash(self, digest):
+        """Paths with digest stored (possibly stale: check with get_hash)."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT path FROM hashes WHERE hash = ?", (digest,))]
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def load(self, file_path, flush=True):
+        """
+        Metadata for file_path, re-extracting (and caching) only if the file
+        changed. Batch callers pass flush=False and call flush() at the end;
+        otherwise the write is committed right away.
+        """
+        meta = self.get(file_path)
+        if meta is not None:
+            return meta
+        key = _file_key(file_path)
+        meta = extract_metadata(file_path)
+        try:
+            meta = self.put(file_path, meta, key)
+        except sqlite3.Error as e:
+            log_error(f"Failed to cache metadata for {file_path}: {e}", e)
+            meta.pop("cover_data", None)
+        if flush:
+            self.flush()
+        if settings.debug_mode:
+            log_debug(f"Metadata extracted: {file_path}")
+        return meta
+
+    def forget(self, file_path):
+        with self._lock:
+            self._conn.execute("DELETE FROM tracks WHERE path = ?", (os.path.abspath(file_path),))
+            self._conn.execute("DELETE FROM loudness WHERE path = ?", (os.path.abspath(file_path),))
+            self._conn.execute("DELETE FROM hashes WHERE path = ?", (os.path.abspath(file_path),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+metadata_index = MetadataIndex()
@@ -0,0 +1,313 @@
+import queue, threading
+
+from .settings import log_debug, log_error, log_info, settings
+from .duration import duration_service
+
+# events put on PlaybackEngine.events
+STARTED  = "started"   # (STARTED, song, length): a load finished and the song plays
+ADVANCED = "advanced"  # (ADVANCED, song, length): the mixer moved on to the queued song
+ENDED    = "ended"     # (ENDED, song): the song ended and nothing was queued
+FAILED   = "failed"    # (FAILED, song, error): the song could not be loaded
+LENGTH   = "length"    # (LENGTH, song, length): playback ran past the header length
+
+class PlaybackEngine:
+    """
+    Owns pygame.mixer on its own thread. Commands (load, pause, seek, ...)
+    are queued and return immediately, so a slow load never blocks the Tk
+    thread; what happened is reported on `events`. The position comes from
+    the mixer clock (get_pos), so it stands still while paused and does not
+    drift with UI timers. The thread sleeps until the next command while
+    nothing is playing.
+    """
+    def __init__(self, poll=0.1):
+        self.poll = poll
+        self.events = queue.Queue()
+        self.on_event = None  # called from the engine thread after each new event
+        self.gain_of = None   # song -> volume factor (loudness normalization), 1.0 if unset
+        self._commands = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pygame = None
+        self._end_event = None
+        self._init_error = None
+        # written by the engine thread only, read by the UI
+        self.song = None
+        self.next = None
+        self.length = 0
+        self.position = 0.0
+        self.playing = False
+        self.paused = False
+        self.volume = 1.0
+        self._gain = 1.0    # factor for the current song, applied on top of volume
+        self._base = 0.0    # position at the last play/seek, in seconds
+        self._mark = 0      # mixer get_pos() at that moment, in ms
+        self._last_pos = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _send(self, *command):
+        self.start()
+        self._commands.put(command)
+
+    def load(self, song):
+        """Stop whatever plays and play song."""
+        self._send("load", song)
+
+    def pause(self):
+        self._send("pause")
+
+    def resume(self):
+        self._send("resume")
+
+    def seek(self, pos):
+        self._send("seek", float(pos))
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self._send("volume", volume)
+
+    def queue_next(self, song):
+        """File to continue with, without a gap, when the current one ends."""
+        self._send("queue", song)
+
+    def stop(self, wait=False):
+        """Stop and unload; with wait=True return once the file is released."""
+        done = threading.Event() if wait else None
+        self._send("stop", done)
+        if done is not None:
+            done.wait(2.0)
+
+    def shutdown(self, timeout=2.0):
+        if self._thread is None:
+            return
+        self._commands.put(("shutdown",))
+        self._thread.join(timeout)
+
+    def _init_mixer(self):
+        import pygame
+        pygame.mixer.init()
+        pygame.mixer.music.set_volume(self.volume)
+        self._pygame = pygame
+        try:
+            # end events are only posted while SDL video is up; no pygame window is opened
+            pygame.display.init()
+            self._end_event = pygame.USEREVENT + 1
+            pygame.mixer.music.set_endevent(self._end_event)
+        except Exception as e:
+            self._end_event = None
+            log_error(f"No end-of-track events, polling the mixer instead: {e}", e)
+        if settings.debug_mode:
+            log_info("Playback engine started")
+
+    def _run(self):
+        try:
+            self._init_mixer()
+        except Exception as e:
+            self._init_error = e
+            log_error(f"Cannot initialise the audio mixer: {e}", e)
+
+        while True:
+            timeout = self.poll if self.playing and not self.paused else None
+            try:
+                commands = [self._commands.get(timeout=timeout)]
+            except queue.Empty:
+                commands = []
+            while True:
+                try:
+                    commands.append(self._commands.get_nowait())
+                except queue.Empty:
+                    break
+            if any(c[0] == "shutdown" for c in commands):
+                break
+
+            # only the last load counts, and nothing sent before it matters
+            loads = [i for i, c in enumerate(commands) if c[0] == "load"]
+            if loads:
+                for c in commands[:loads[-1]]:
+                    if c[0] == "stop" and c[1] is not None:
+                        c[1].set()
+                commands = commands[loads[-1]:]
+            for command in commands:
+                try:
+                    getattr(self, "_do_" + command[0])(*command[1:])
+                except Exception as e:
+                    log_error(f"Playback command {command[0]} failed: {e}", e)
+
+            if self.playing and not self.paused:
+                try:
+                    self._update()
+                except Exception as e:
+                    log_error(f"Playback update failed: {e}", e)
+
+    def _emit(self, event):
+        self.events.put(event)
+        if self.on_event is not None:
+            self.on_event()
+
+    def _clear_end_events(self):
+        if self._end_event is not None:
+            # load()/stop() end the previous file and post an event of their own
+            self._pygame.event.clear(self._end_event)
+
+    def _do_load(self, song):
+        try:
+            if self._init_error is not None:
+                raise self._init_error
+            music = self._pygame.mixer.music
+            music.load(song["file"])
+            length = duration_service.probe(song["file"], song.get("metadata"))
+            self._set_gain(song)
+            music.play()
+        except Exception as e:
+            self.playing = False
+            self.song = None
+            self._emit((FAILED, song, e))
+            return
+        self._clear_end_events()
+        self.song = song
+        self.next = None
+        self.length = length
+        self.playing = True
+        self.paused = False
+        self._base, self._mark, self._last_pos = 0.0, 0, 0
+        self.position = 0.0
+        if settings.debug_mode:
+            log_info(f"Playing song: {song['file']}")
+        self._emit((STARTED, song, length))
+
+    def _do_pause(self):
+        if self.playing and not self.paused:
+            self._pygame.mixer.music.pause()
+            self.paused = True
+
+    def _do_resume(self):
+        if self.playing and self.paused:
+            self._pygame.mixer.music.unpause()
+            self.paused = False
+
+    def _do_seek(self, pos):
+        if not self.playing:
+            return
+        self._pygame.mixer.music.set_pos(pos)
+        self._base = pos
+        self._mark = self._last_pos = max(0, self._pygame.mixer.music.get_pos())
+        self.position = pos
+
+    def _do_volume(self, volume):
+        if self._pygame is not None:
+            self._pygame.mixer.music.set_volume(volume * self._gain)
+
+    def _set_gain(self, song):
+        gain = 1.0
+        if self.gain_of is not None:
+            try:
+                gain = self.gain_of(song)
+            except Exception as e:
+                log_error(f"No volume gain for {song['file']}: {e}", e)
+        self._gain = gain
+        self._pygame.mixer.music.set_volume(self.volume * gain)
+
+    def _do_queue(self, song):
+        queued, self.next = self.next, None
+        if not self.playing:
+            return
+        if song is None:
+            if queued is not None:
+                self._drop_queued()
+            return
+        # replaces whatever was queued before
+        self._pygame.mixer.music.queue(song["file"])
+        self.next = song
+        if settings.debug_mode:
+            log_debug(f"Preloaded next song: {song['file']}")
+
+    def _drop_queued(self):
+        # the mixer cannot unqueue a file: reload the current one where it is,
+        # which also forgets the queue (a short gap, only when the queue is cleared)
+        music = self._pygame.mixer.music
+        pos, paused = self.position, self.paused
+        try:
+            music.load(self.song["file"])
+            try:
+                music.play(start=pos)
+            except Exception:
+                # formats without seeking restart from the top
+                music.play()
+                pos = 0.0
+        except Exception as e:
+            log_error(f"Cannot drop the queued song: {e}", e)
+            return
+        self._clear_end_events()
+        self._base = self.position = pos
+        self._mark = self._last_pos = 0
+        if paused:
+            music.pause()
+        if settings.debug_mode:
+            log_debug("Queued song dropped")
+
+    def _do_stop(self, done=None):
+        try:
+            if self._pygame is not None:
+                self._stop()
+        finally:
+            if done is not None:
+                done.set()
+
+    def _stop(self):
+        music = self._pygame.mixer.music
+        music.stop()
+        try:
+            music.unload()
+        except Exception:
+            pass
+        self._clear_end_events()
+        self.playing = False
+        self.paused = False
+        self.song = None
+        self.next = None
+        self.position = 0.0
+
+    def _update(self):
+        pg = self._pygame
+        # events first: a switch to the queued file after this is then seen as
+        # a restarted position, never as a stale one next to a drained event
+        if self._end_event is not None:
+            ended = any(e.type == self._end_event for e in pg.event.get())
+        mixer_pos = pg.mixer.music.get_pos()
+        busy = pg.mixer.music.get_busy()
+        if self._end_event is None:
+            ended = not busy
+        # get_pos() restarts from 0 when the mixer moves on to the queued file
+        restarted = 0 <= mixer_pos < self._last_pos
+
+        if ended or restarted:
+            if self.next is not None and busy:
+                song, self.next = self.next, None
+                self.song = song
+                self.length = duration_service.probe(song["file"], song.get("metadata"))
+                # the mixer has one volume: the new song's gain applies from here on
+                self._set_gain(song)
+                self._base, self._mark = 0.0, 0
+                mixer_pos = max(0, mixer_pos)
+                if settings.debug_mode:
+                    log_info(f"Playing song (gapless): {song['file']}")
+                self._emit((ADVANCED, song, self.length))
+            elif ended and not busy:
+                # (ended while busy: the event of a switch already handled by the restart)
+                self.playing = False
+                self._emit((ENDED, self.song))
+                return
+
+        self._last_pos = mixer_pos
+        self.position = self._base + max(0, mixer_pos - self._mark) / 1000
+        if busy and self.position > self.length + 1:
+            # the header under-reported the length, trust playback instead
+            self.length = self.position
+            duration_service.correct(self.song["file"], self.position)
+            self._emit((LENGTH, self.song, self.length))
+
+playback_engine = PlaybackEngine()
@@ -0,0 +1,120 @@
+from bisect import bisect_left
+
+class Playlist:
+    """
+    Songs of one playlist kept in id order, with an id -> song map for O(1)
+    lookup and bisect for O(log n) positions. Song dicts keep their "id" as
+    a string in canonical form ("07" is stored and looked up as "7", so two
+    songs never share a position); ids are handed out by a monotonic
+    allocator so they never collide after deletes.
+    """
+    def __init__(self, songs=()):
+        self._by_id = {}
+        self._keys = []   # sorted int ids
+        self._songs = []  # songs in the same order as _keys
+        self._next_id = 1
+        self.version = 0  # bumped on every add/remove, lets views resync lazily
+        for song in songs:
+            # older configs could contain duplicate ids (len+1 allocation)
+            if not self._valid_id(song.get("id")) or self._norm(song["id"]) in self._by_id:
+                song["id"] = self.allocate_id()
+            self._insert(song)
+
+    @staticmethod
+    def _valid_id(song_id):
+        try:
+            int(song_id)
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    @staticmethod
+    def _norm(song_id):
+        # the same integer always maps to the same key; other values are left
+        # as they are and simply not found
+        try:
+            return str(int(song_id))
+        except (TypeError, ValueError):
+            return song_id
+
+    def _insert(self, song):
+        song["id"] = self._norm(song["id"])
+        key = int(song["id"])
+        pos = bisect_left(self._keys, key)
+        self._keys.insert(pos, key)
+        self._songs.insert(pos, song)
+        self._by_id[song["id"]] = song
+        self.version += 1
+        self._next_id = max(self._next_id, key + 1)
+
+    def __len__(self):
+        return len(self._songs)
+
+    def __iter__(self):
+        return iter(self._songs)
+
+    def __getitem__(self, index):
+        return self._songs[index]
+
+    def __contains__(self, song):
+        return isinstance(song, dict) and self._by_id.get(song.get("id")) is song
+
+    def __bool__(self):
+        return bool(self._songs)
+
+    def get(self, song_id):
+        return self._by_id.get(self._norm(song_id))
+
+    def index_of(self, song_id):
+        """Position of song_id in playlist order, or None."""
+        song_id = self._norm(song_id)
+        if song_id not in self._by_id:
+            return None
+        return bisect_left(self._keys, int(song_id))
+
+    def allocate_id(self):
+        song_id = str(self._next_id)
+        self._next_id += 1
+        return song_id
+
+    def peek_id(self):
+        """The id the next allocate_id() call will return."""
+        return str(self._next_id)
+
+    def add(self, song):
+        if not song.get("id"):
+            song["id"] = self.allocate_id()
+        if self._norm(song["id"]) in self._by_id:
+            raise ValueError(f"Song ID already exists: {song['id']}")
+        self._insert(song)
+        return song
+
+    def remove(self, song_id):
+        song_id = self._norm(song_id)
+        song = self._by_id.pop(song_id, None)
+        if song is None:
+            return None
+        pos = bisect_left(self._keys, int(song_id))
+        del self._keys[pos]
+        del self._songs[pos]
+        self.version += 1
+        return song
+
+    def change_id(self, song_id, new_id):
+        song_id, new_id = self._norm(song_id), self._norm(new_id)
+        if new_id == song_id:
+            return
+        if new_id in self._by_id:
+            raise ValueError(f"Song ID already exists: {new_id}")
+        song = self.remove(song_id)
+        song["id"] = new_id
+        self._insert(song)
+
+    def step(self, song_id, offset):
+        """Song `offset` positions away from song_id, wrapping around."""
+        if not self._songs:
+            return None
+        index = self.index_of(song_id)
+        if index is None:
+            return self._songs[0]
+        return self._songs[(index + offset) % len(self._songs)]
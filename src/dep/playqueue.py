@@ -0,0 +1,78 @@
+from collections import deque
+
+class PlayQueue:
+    """
+    Songs to play before going back to playlist order, as (playlist, song id)
+    references in a deque: play next, add to end and taking the head are
+    O(1). References whose song was removed or renamed away are dropped when
+    they reach the head. `resolve(playlist, song_id)` maps a reference back
+    to its song dict (or None).
+    """
+    def __init__(self, resolve, items=()):
+        self.resolve = resolve
+        self._items = deque(items)
+        self.version = 0  # bumped on every change, for cheap "needs saving" checks
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def _changed(self):
+        self.version += 1
+
+    def play_next(self, playlist, song_id):
+        self._items.appendleft((playlist, song_id))
+        self._changed()
+
+    def add(self, playlist, song_id):
+        self._items.append((playlist, song_id))
+        self._changed()
+
+    def peek(self):
+        """(song, playlist) at the head, or (None, None) when empty."""
+        while self._items:
+            playlist, song_id = self._items[0]
+            song = self.resolve(playlist, song_id)
+            if song is not None:
+                return song, playlist
+            self._items.popleft()
+            self._changed()
+        return None, None
+
+    def pop(self):
+        song, playlist = self.peek()
+        if song is not None:
+            self._items.popleft()
+            self._changed()
+        return song, playlist
+
+    def remove(self, index):
+        del self._items[index]
+        self._changed()
+
+    def move(self, index, offset):
+        """Move the item at index by offset positions; returns its new index."""
+        new_index = max(0, min(len(self._items) - 1, index + offset))
+        if new_index != index:
+            item = self._items[index]
+            del self._items[index]
+            self._items.insert(new_index, item)
+            self._changed()
+        return new_index
+
+    def clear(self):
+        self._items.clear()
+        self._changed()
+
+    def rename_playlist(self, old, new):
+        if any(p == old for p, _ in self._items):
+            self._items = deque((new if p == old else p, sid) for p, sid in self._items)
+            self._changed()
@@ -0,0 +1,86 @@
+import queue, threading
+
+from .settings import log_debug, log_error, log_info, settings
+
+class MetadataScanner:
+    """
+    Background metadata scan over a bounded pool of worker threads.
+    Tag reads are I/O bound, so threads keep the disk busy while the Tk
+    thread only drains finished (path, metadata) pairs in batches.
+    """
+    def __init__(self, index, workers=None):
+        self.index = index
+        self.workers = max(1, int(workers or settings.scan_workers))
+        self.total = 0
+        self.done = 0
+        self._paths = queue.Queue()
+        self._results = queue.Queue()
+        self._cancelled = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self, files):
+        """Queue files for scanning; can be called again while the scan runs."""
+        seen = set()
+        for f in files:
+            if f not in seen:
+                seen.add(f)
+                self._paths.put(f)
+        with self._lock:
+            self.total += len(seen)
+        if settings.debug_mode:
+            log_debug(f"Metadata scan: {len(seen)} files queued, {self.workers} workers")
+        self._spawn()
+
+    def _spawn(self):
+        with self._lock:
+            self._threads = [th for th in self._threads if th.is_alive()]
+            missing = min(self.workers, self._paths.qsize()) - len(self._threads)
+            for _ in range(max(0, missing)):
+                th = threading.Thread(target=self._work, daemon=True)
+                th.start()
+                self._threads.append(th)
+
+    def _work(self):
+        while not self._cancelled.is_set():
+            try:
+                path = self._paths.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                meta = self.index.load(path, flush=False)
+            except Exception as e:
+                log_error(f"Metadata scan failed for {path}: {e}", e)
+                meta = {}
+            self._results.put((path, meta))
+            with self._lock:
+                self.done += 1
+        self.index.flush()
+
+    def drain(self, limit=500):
+        """Finished (path, metadata) pairs, at most `limit` per call."""
+        if not self._paths.empty() and not self.running and not self._cancelled.is_set():
+            # files queued while the last worker was exiting
+            self._spawn()
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @property
+    def running(self):
+        return any(th.is_alive() for th in self._threads)
+
+    @property
+    def finished(self):
+        return not self.running and self._paths.empty() and self._results.empty()
+
+    def cancel(self, timeout=2.0):
+        self._cancelled.set()
+        for th in self._threads:
+            th.join(timeout)
+        if settings.debug_mode:
+            log_info(f"Metadata scan cancelled at {self.done}/{self.total}")
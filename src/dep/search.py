@@ -0,0 +1,266 @@
+import os, re, itertools, threading
+from bisect import bisect_left, insort
+
+from .settings import log_error
+
+_word = re.compile(r"\w+", re.UNICODE)
+
+def _tokens(song):
+    meta = song.get("metadata") or {}
+    genre = meta.get("genre") or []
+    if isinstance(genre, str):
+        genre = [genre]
+    fields = [song.get("name", ""), meta.get("title", ""), meta.get("artist", ""),
+              meta.get("album", ""), os.path.splitext(os.path.basename(song.get("file", "")))[0]]
+    fields.extend(genre)
+    return tuple(sorted({w for field in fields if field for w in _word.findall(str(field).lower())}))
+
+class SearchIndex:
+    """
+    Inverted index over name, title, artist, album, genre and file name of
+    every song in every playlist. Words are kept in a sorted vocabulary, so
+    a prefix is a bisect range; a query matches songs that have a word
+    starting with each of its terms. Songs are keyed by identity, which
+    survives id and name edits; add/update/remove are incremental.
+    """
+    cached_prefix = 2       # terms up to this long keep their song set between queries
+    prefix_cache_size = 64
+    check_budget = 2000     # songs checked one by one before building a short prefix's set
+
+    def __init__(self, limit=200):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._docs = {}      # id(song) -> (playlist, song, tokens)
+        self._postings = {}  # word -> set of id(song)
+        self._vocab = []     # sorted words
+        self._prefix_cache = {}  # short prefix -> set of id(song), oldest first
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, playlist, song):
+        with self._lock:
+            for w in self._add(playlist, song):
+                insort(self._vocab, w)
+
+    def add_many(self, playlist, songs, batch=2000):
+        # new words are merged into the vocabulary once per batch (a sort of
+        # two sorted runs) instead of one insort each; the lock is released
+        # between batches so a query never waits behind a whole build
+        songs = list(songs)
+        for i in range(0, len(songs), batch):
+            with self._lock:
+                new = []
+                for song in songs[i:i + batch]:
+                    new.extend(self._add(playlist, song))
+                # a song listed twice comes back as new twice
+                new = {w for w in new if w in self._postings}
+                if new:
+                    self._vocab.extend(new)
+                    self._vocab.sort()
+
+    def _add(self, playlist, song):
+        """Index song, returns the words that are new to the vocabulary."""
+        self._remove(id(song))
+        tokens = _tokens(song)
+        self._docs[id(song)] = (playlist, song, tokens)
+        new = []
+        for w in tokens:
+            posting = self._postings.get(w)
+            if posting is None:
+                posting = self._postings[w] = set()
+                new.append(w)
+            posting.add(id(song))
+            self._cache_update(w, id(song), set.add)
+        return new
+
+    def update(self, song):
+        """Reindex after its name or metadata changed."""
+        with self._lock:
+            doc = self._docs.get(id(song))
+            if doc is not None:
+                for w in self._add(doc[0], song):
+                    insort(self._vocab, w)
+
+    def remove(self, song):
+        with self._lock:
+            self._remove(id(song))
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for w in doc[2]:
+            self._cache_update(w, key, set.discard)
+            posting = self._postings[w]
+            posting.discard(key)
+            if not posting:
+                del self._postings[w]
+                # (a word added earlier in the same add_many batch is not in the vocabulary yet)
+                i = bisect_left(self._vocab, w)
+                if i < len(self._vocab) and self._vocab[i] == w:
+                    del self._vocab[i]
+
+    def _cache_update(self, word, key, op):
+        if self._prefix_cache:
+            for n in range(1, self.cached_prefix + 1):
+                found = self._prefix_cache.get(word[:n])
+                if found is not None:
+                    op(found, key)
+
+    def remove_playlist(self, songs):
+        with self._lock:
+            for song in songs:
+                self._remove(id(song))
+
+    def rename_playlist(self, old, new):
+        with self._lock:
+            for key, (playlist, song, tokens) in self._docs.items():
+                if playlist == old:
+                    self._docs[key] = (new, song, tokens)
+
+    def reconcile(self, locate):
+        """
+        Fix up songs indexed from a snapshot: `locate(playlist, song)` gives
+        the playlist now holding song, or None when it was removed meanwhile.
+        """
+        with self._lock:
+            for key, (playlist, song, tokens) in list(self._docs.items()):
+                current = locate(playlist, song)
+                if current is None:
+                    self._remove(key)
+                elif current != playlist:
+                    self._docs[key] = (current, song, tokens)
+
+    def _range(self, prefix):
+        lo = bisect_left(self._vocab, prefix)
+        hi = bisect_left(self._vocab, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _has_prefix(self, key, prefix):
+        # a song's words are a sorted tuple: a prefix sorts right before its matches
+        words = self._docs[key][2]
+        i = bisect_left(words, prefix)
+        return i < len(words) and words[i].startswith(prefix)
+
+    def _matching(self, term, lo, hi):
+        """Ids of the songs having a word in vocabulary range lo:hi (the words starting with term)."""
+        if len(term) > self.cached_prefix:
+            found = set()
+            for w in self._vocab[lo:hi]:
+                found.update(self._postings[w])
+            return found
+        # one- and two-letter prefixes span thousands of words: their unions are
+        # kept (and updated in _add/_remove) while they are among the recent ones
+        found = self._prefix_cache.pop(term, None)
+        if found is None:
+            found = set()
+            for w in self._vocab[lo:hi]:
+                found.update(self._postings[w])
+            if len(self._prefix_cache) >= self.prefix_cache_size:
+                del self._prefix_cache[next(iter(self._prefix_cache))]
+        self._prefix_cache[term] = found
+        return found
+
+    def _intersect(self, terms, ranges):
+        """Ids (or an iterable of them) of the songs matching every term."""
+        # Set intersections run in C, smallest set first. Short prefixes span
+        # thousands of words, so while their set is not cached they are first
+        # checked against the candidates' own words, which usually fills the
+        # limit long before such a union would be built.
+        cold = [term for term in terms
+                if len(term) <= self.cached_prefix and term not in self._prefix_cache]
+        warm = [term for term in terms if term not in cold]
+        if not cold:
+            sets = sorted((self._matching(term, *ranges[term]) for term in warm), key=len)
+            return sets[0].intersection(*sets[1:])
+
+        costs = {term: sum(len(self._postings[w]) for w in self._vocab[slice(*ranges[term])]) for term in cold}
+        cold.sort(key=costs.get)
+        if warm:
+            sets = sorted((self._matching(term, *ranges[term]) for term in warm), key=len)
+            found = sets[0].intersection(*sets[1:])
+            size = len(found)
+        else:
+            # only short prefixes: walk the narrowest one's postings lazily
+            base = cold.pop(0)
+            lo, hi = ranges[base]
+            found = _unique(itertools.chain.from_iterable(self._postings[w] for w in self._vocab[lo:hi]))
+            size = costs[base]
+        # worth it only if, taking the terms as independent, the limit is
+        # expected to be reached within the budget
+        share = 1.0
+        for term in cold:
+            share *= min(1.0, costs[term] / len(self._docs))
+        if min(size, self.limit / max(share, 1e-9)) <= self.check_budget:
+            results = []
+            for n, key in enumerate(found, 1):
+                if all(self._has_prefix(key, term) for term in cold):
+                    results.append(key)
+                    if len(results) >= self.limit:
+                        return results
+                if n >= self.check_budget:
+                    break
+            else:
+                return results
+        if not warm:
+            found = self._matching(base, *ranges[base])
+        return found.intersection(*(self._matching(term, *ranges[term]) for term in cold))
+
+    def search(self, query):
+        """[(playlist, song)] matching every term of query, at most self.limit."""
+        terms = set(_word.findall(query.lower()))
+        if not terms:
+            return []
+        with self._lock:
+            ranges = {}
+            for term in terms:
+                lo, hi = self._range(term)
+                if lo == hi:
+                    return []
+                ranges[term] = (lo, hi)
+            if len(terms) == 1:
+                # stream the postings and stop at the limit, so even a
+                # one-letter prefix touches only a few hundred songs
+                lo, hi = ranges.popitem()[1]
+                found = _unique(itertools.chain.from_iterable(self._postings[w] for w in self._vocab[lo:hi]))
+            else:
+                found = self._intersect(terms, ranges)
+            return [self._docs[key][:2] for key in itertools.islice(found, self.limit)]
+
+def _unique(keys):
+    seen = set()
+    for key in keys:
+        if key not in seen:
+            seen.add(key)
+            yield key
+
+class SearchWorker:
+    """
+    Runs queries on a background thread. Only the latest submitted query
+    is run; its results are passed to on_results(query, results).
+    """
+    def __init__(self, index, on_results):
+        self.index = index
+        self.on_results = on_results
+        self._query = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, query):
+        with self._cond:
+            self._query = query
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._query is None:
+                    self._cond.wait()
+                query, self._query = self._query, None
+            try:
+                results = self.index.search(query)
+            except Exception as e:
+                log_error(f"Search failed for {query!r}: {e}", e)
+                results = []
+            self.on_results(query, results)
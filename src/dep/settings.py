@@ -1,70 +1,36 @@
 import os
 import json
-from datetime import datetime
-from termcolor import colored
+import atexit
+
+from .logger import AsyncLogger, DEBUG, INFO, ERROR, LEVELS
 
 # src/dep/settings.py
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox
 import customtkinter as ctk
 
 program_version = '0.5 (Beta)'
 
-ctk.set_appearance_mode("dark")
-ctk.set_widget_scaling(1.1)
-
 _settings_path = 'settings.json'
 _log_path = 'log'
 
-debug_file = os.path.join(_log_path, 'debug_log.txt')
-error_file = os.path.join(_log_path, 'error_log.txt')
+logger = AsyncLogger(_log_path, header="Version: " + program_version)
+atexit.register(logger.close)
 
-if not os.path.exists(_log_path):
-    os.makedirs(_log_path)
-
-with open(debug_file, 'w') as f:    
-    f.write("Debug log\n")
-    f.write("Version: " + program_version + "\n")
-    
-    f.close()
-    
-with open(error_file, 'w') as f:    
-    f.write("Error log\n")
-    f.write("Version: " + program_version + "\n")
-    
-    f.close()
+debug_file = logger.debug_file
+error_file = logger.error_file
 
 def log_debug(msg):
-    now = datetime.now().strftime("%H:%M:%S")
-    print(colored(now, 'white'), colored(msg, 'green'))
-    
-    with open(debug_file, 'a') as f:
-        f.write(f"{now}: {msg}\n")
-        
-        f.close()
+    logger.log(DEBUG, msg)
 
 def log_info(msg):
-    now = datetime.now().strftime("%H:%M:%S")
-    print(colored(now, 'white'), colored(msg, 'white'))
-    
-    with open(debug_file, 'a') as f:
-        f.write(f"{now}: {msg}\n")
-        
-        f.close()
+    logger.log(INFO, msg)
     
 def log_error(msg, err=None):
-    now = datetime.now().strftime("%H:%M:%S")
-    print(colored(now, 'white'), colored(msg, 'red'), colored(" | Error type: ", 'blue'), colored(type(err), 'white'))
-    
-    with open(debug_file, 'a') as f:
-        f.write(f"{now}: {msg} | Error type: {type(err)}\n")
-        
-        f.close()
-        
-    with open(error_file, 'a') as f:
-        f.write(f"{now}: {msg} | Error type: {type(err)}\n")
-        
-        f.close()
+    logger.log(ERROR, msg, err)
+
+DEFAULT_YOUTUBE_CMD = 'yt-dlp -x --audio-format mp3 --audio-quality 0 -o "{out}/%(title)s.%(ext)s" {url}'
+DEFAULT_SPOTIFY_CMD = 'spotdl {url} --output "{out}" --bitrate 192k'
 
 class Settings:
     def __init__(self):
@@ -73,10 +39,30 @@ class Settings:
         )
         self.debug_mode = False
         self.audio_output_device = ''
-        self.youtube_cmd = 'yt-dlp -x --audio-format mp3 --audio-quality 0 -o "{out}/%(title)s.%(ext)s" {url}'
-        self.spotify_cmd = 'spotdl {url} --output "{out}" --bitrate 192k'
+        self.youtube_cmd = DEFAULT_YOUTUBE_CMD
+        self.spotify_cmd = DEFAULT_SPOTIFY_CMD
+        self.youtube_in_process = True  # Use the yt_dlp module instead of the CLI when the command is the default one
+        self.library_roots = []  # Extra folders indexed next to the download path
+        self.library_auto_import = False  # Import new audio files found in the library folders
+        self.library_import_playlist = ''  # Target playlist for auto import (empty: selected playlist)
+        self.library_watch = False  # Keep polling the library folders for new files
+        self.library_watch_interval = 30  # Seconds between two polls
         self.ask_on_delete = True
         self.default_volume = 1.0  # Default volume level (0.0 to 1.0)
+        self.scan_workers = min(8, (os.cpu_count() or 1) + 4)  # Threads used to read tags in the background
+        self.artwork_cache_entries = 64  # Cover thumbnails kept in memory
+        self.artwork_disk_cache = True  # Keep resized covers on disk between sessions
+        self.artwork_disk_cache_mb = 100
+        self.artwork_cache_stats = False  # Log artwork cache hits/misses
+        self.max_downloads = 3  # Downloads running at the same time
+        self.log_level = 'debug'  # debug, info or error
+        self.log_max_mb = 5  # Log files are rotated past this size
+        self.shuffle_seed = ''  # Fixed seed for a reproducible shuffle order (empty: random)
+        self.normalize_volume = True  # Play every track at the same loudness (needs ffmpeg for non-WAV files)
+        self.target_loudness = -14.0  # LUFS; louder tracks are turned down to this
+        self.loudness_workers = max(1, (os.cpu_count() or 2) // 2)  # Processes measuring loudness in the background
+        self.detect_duplicates = True  # Warn when a downloaded or imported song is already in the library
+        self.hash_workers = 4  # Threads hashing audio for duplicate detection
 
     def to_dict(self):
         return {
@@ -86,7 +72,27 @@ class Settings:
             'youtube_cmd': self.youtube_cmd,
             'spotify_cmd': self.spotify_cmd,
             'ask_on_delete': self.ask_on_delete,
-            'default_volume': self.default_volume
+            'default_volume': self.default_volume,
+            'scan_workers': self.scan_workers,
+            'artwork_cache_entries': self.artwork_cache_entries,
+            'artwork_disk_cache': self.artwork_disk_cache,
+            'artwork_disk_cache_mb': self.artwork_disk_cache_mb,
+            'artwork_cache_stats': self.artwork_cache_stats,
+            'max_downloads': self.max_downloads,
+            'youtube_in_process': self.youtube_in_process,
+            'library_roots': self.library_roots,
+            'library_auto_import': self.library_auto_import,
+            'library_import_playlist': self.library_import_playlist,
+            'library_watch': self.library_watch,
+            'library_watch_interval': self.library_watch_interval,
+            'log_level': self.log_level,
+            'log_max_mb': self.log_max_mb,
+            'shuffle_seed': self.shuffle_seed,
+            'normalize_volume': self.normalize_volume,
+            'target_loudness': self.target_loudness,
+            'loudness_workers': self.loudness_workers,
+            'detect_duplicates': self.detect_duplicates,
+            'hash_workers': self.hash_workers
         }
 
     def update_from_dict(self, data):
@@ -96,6 +102,10 @@ class Settings:
 
 settings = Settings()
 
+def apply_log_settings(s=settings):
+    logger.level = LEVELS.get(s.log_level, DEBUG)
+    logger.max_bytes = max(1, int(s.log_max_mb)) * 1024 * 1024
+
 def save_settings(s=settings):
     try:
         with open(_settings_path, 'w') as f:
@@ -115,6 +125,7 @@ def load_settings():
         save_settings(settings)
 
 load_settings()
+apply_log_settings()
 
 class SettingsWindow:
     def __init__(self, master, settings, on_close=None, on_change=None):
@@ -146,6 +157,10 @@ class SettingsWindow:
         self.ask_var = tk.BooleanVar(value=settings.ask_on_delete)
         ctk.CTkCheckBox(self.frame, text="Ask everytime", variable=self.ask_var).grid(row=2, column=0, columnspan=3, sticky="w", pady=5, padx=5)
         
+        # In-process yt-dlp (only used with the default YouTube command)
+        self.in_process_var = tk.BooleanVar(value=settings.youtube_in_process)
+        ctk.CTkCheckBox(self.frame, text="Built-in YouTube downloader (default command only)", variable=self.in_process_var).grid(row=2, column=3, columnspan=2, sticky="w", pady=5, padx=5)
+        
         
         # add in later versions
         #self.audio_var = tk.StringVar(value=settings.audio_output_device)
@@ -162,11 +177,77 @@ class SettingsWindow:
         self.volume_var = tk.StringVar(value=int(settings.default_volume*100))  # Convert to percentage
         ctk.CTkEntry(self.frame, textvariable=self.volume_var, width=38).grid(row=5, column=1, pady=5, padx=5)
         ctk.CTkLabel(self.frame, text="%").grid(row=5, column=2, sticky="w", pady=5, padx=5)
+        self.dl_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.dl_frame.grid(row=5, column=3, columnspan=2, sticky="w")
+        ctk.CTkLabel(self.dl_frame, text="Parallel Downloads").pack(side=tk.LEFT, padx=5)
+        self.max_dl_var = tk.StringVar(value=settings.max_downloads)
+        ctk.CTkEntry(self.dl_frame, textvariable=self.max_dl_var, width=38).pack(side=tk.LEFT, padx=5)
+        
+        # Artwork cache
+        ctk.CTkLabel(self.frame, text="Artwork Cache").grid(row=6, column=0, sticky="w", pady=5, padx=5)
+        self.art_entries_var = tk.StringVar(value=settings.artwork_cache_entries)
+        ctk.CTkEntry(self.frame, textvariable=self.art_entries_var, width=38).grid(row=6, column=1, pady=5, padx=5)
+        ctk.CTkLabel(self.frame, text="covers").grid(row=6, column=2, sticky="w", pady=5, padx=5)
+        self.art_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.art_frame.grid(row=6, column=3, columnspan=2, sticky="w")
+        self.art_disk_var = tk.BooleanVar(value=settings.artwork_disk_cache)
+        ctk.CTkCheckBox(self.art_frame, text="Disk cache", variable=self.art_disk_var).pack(side=tk.LEFT, padx=5)
+        self.art_mb_var = tk.StringVar(value=settings.artwork_disk_cache_mb)
+        ctk.CTkEntry(self.art_frame, textvariable=self.art_mb_var, width=45).pack(side=tk.LEFT, padx=5)
+        ctk.CTkLabel(self.art_frame, text="MB").pack(side=tk.LEFT)
+        self.art_stats_var = tk.BooleanVar(value=settings.artwork_cache_stats)
+        ctk.CTkCheckBox(self.art_frame, text="Log hits/misses", variable=self.art_stats_var).pack(side=tk.LEFT, padx=10)
+        
+        # Library folders / auto import
+        ctk.CTkLabel(self.frame, text="Library").grid(row=7, column=0, sticky="w", pady=5, padx=5)
+        self.lib_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.lib_frame.grid(row=7, column=3, columnspan=2, sticky="w")
+        self.auto_import_var = tk.BooleanVar(value=settings.library_auto_import)
+        ctk.CTkCheckBox(self.lib_frame, text="Auto-import into", variable=self.auto_import_var).pack(side=tk.LEFT, padx=5)
+        self.import_playlist_var = tk.StringVar(value=settings.library_import_playlist)
+        ctk.CTkEntry(self.lib_frame, textvariable=self.import_playlist_var, width=120, placeholder_text="selected playlist").pack(side=tk.LEFT, padx=5)
+        self.watch_var = tk.BooleanVar(value=settings.library_watch)
+        ctk.CTkCheckBox(self.lib_frame, text="Watch folders", variable=self.watch_var).pack(side=tk.LEFT, padx=10)
+        ctk.CTkLabel(self.frame, text="Extra Library Folders").grid(row=8, column=0, sticky="w", pady=5, padx=5)
+        self.roots_var = tk.StringVar(value=";".join(settings.library_roots))
+        ctk.CTkEntry(self.frame, textvariable=self.roots_var, width=450, placeholder_text="folder1;folder2").grid(row=8, column=3, columnspan=2)
+        
+        # Logging
+        ctk.CTkLabel(self.frame, text="Log Level").grid(row=9, column=0, sticky="w", pady=5, padx=5)
+        self.log_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.log_frame.grid(row=9, column=3, columnspan=2, sticky="w")
+        self.log_level_var = tk.StringVar(value=settings.log_level)
+        ctk.CTkOptionMenu(self.log_frame, variable=self.log_level_var, values=list(LEVELS), width=100).pack(side=tk.LEFT, padx=5)
+        ctk.CTkLabel(self.log_frame, text="Rotate at").pack(side=tk.LEFT, padx=5)
+        self.log_mb_var = tk.StringVar(value=settings.log_max_mb)
+        ctk.CTkEntry(self.log_frame, textvariable=self.log_mb_var, width=45).pack(side=tk.LEFT, padx=5)
+        ctk.CTkLabel(self.log_frame, text="MB").pack(side=tk.LEFT)
         
-        ctk.CTkButton(self.frame, text="Save", command=self.save).grid(row=7, column=0, columnspan=3, pady=10)
-        ctk.CTkButton(self.frame, text="Reset to default", command=self.reset).grid(row=7, column=3, columnspan=3, pady=10)
+        # Shuffle
+        ctk.CTkLabel(self.frame, text="Shuffle Seed").grid(row=10, column=0, sticky="w", pady=5, padx=5)
+        self.seed_var = tk.StringVar(value=settings.shuffle_seed)
+        ctk.CTkEntry(self.frame, textvariable=self.seed_var, width=120, placeholder_text="random").grid(row=10, column=3, sticky="w", padx=5)
+        
+        # Loudness normalization
+        ctk.CTkLabel(self.frame, text="Volume Normalization").grid(row=11, column=0, sticky="w", pady=5, padx=5)
+        self.norm_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.norm_frame.grid(row=11, column=3, columnspan=2, sticky="w")
+        self.normalize_var = tk.BooleanVar(value=settings.normalize_volume)
+        ctk.CTkCheckBox(self.norm_frame, text="Normalize loudness to", variable=self.normalize_var).pack(side=tk.LEFT, padx=5)
+        self.target_var = tk.StringVar(value=settings.target_loudness)
+        ctk.CTkEntry(self.norm_frame, textvariable=self.target_var, width=50).pack(side=tk.LEFT, padx=5)
+        ctk.CTkLabel(self.norm_frame, text="LUFS").pack(side=tk.LEFT)
+        
+        # Duplicates
+        ctk.CTkLabel(self.frame, text="Duplicates").grid(row=12, column=0, sticky="w", pady=5, padx=5)
+        self.duplicates_var = tk.BooleanVar(value=settings.detect_duplicates)
+        ctk.CTkCheckBox(self.frame, text="Warn when adding a song already in the library", variable=self.duplicates_var).grid(row=12, column=3, columnspan=2, sticky="w", padx=5)
+        
+        ctk.CTkButton(self.frame, text="Save", command=self.save).grid(row=13, column=0, columnspan=3, pady=10)
+        ctk.CTkButton(self.frame, text="Reset to default", command=self.reset).grid(row=13, column=3, columnspan=3, pady=10)
         
     def browse_path(self):
+        from tkinter import filedialog
         path = filedialog.askdirectory()
         if path: self.path_var.set(path)
     def save(self):
@@ -175,12 +256,59 @@ class SettingsWindow:
         settings.ask_on_delete = self.ask_var.get()
         #settings.audio_output_device = self.audio_var.get()
         settings.youtube_cmd = self.yt_cmd.get().strip()
+        settings.youtube_in_process = self.in_process_var.get()
+        settings.library_auto_import = self.auto_import_var.get()
+        settings.library_import_playlist = self.import_playlist_var.get().strip()
+        settings.library_watch = self.watch_var.get()
+        settings.library_roots = [r.strip() for r in self.roots_var.get().split(";") if r.strip()]
         settings.spotify_cmd = self.sp_cmd.get().strip()
         if int(self.volume_var.get()) < 0 or int(self.volume_var.get()) > 100:
             messagebox.showerror("Error", "Volume must be between 0 and 100.")
             return
         else:
             settings.default_volume = int(self.volume_var.get()) / 100
+        try:
+            art_entries = int(self.art_entries_var.get())
+            art_mb = int(self.art_mb_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Artwork cache sizes must be integers.")
+            return
+        if art_entries < 1 or art_mb < 0:
+            messagebox.showerror("Error", "Artwork cache sizes must be positive.")
+            return
+        try:
+            max_downloads = int(self.max_dl_var.get())
+        except ValueError:
+            max_downloads = 0
+        if max_downloads < 1:
+            messagebox.showerror("Error", "Parallel downloads must be at least 1.")
+            return
+        try:
+            log_mb = int(self.log_mb_var.get())
+        except ValueError:
+            log_mb = 0
+        if log_mb < 1:
+            messagebox.showerror("Error", "Log size must be at least 1 MB.")
+            return
+        try:
+            target = float(self.target_var.get())
+        except ValueError:
+            target = 1.0
+        if not -70 <= target <= 0:
+            messagebox.showerror("Error", "Target loudness must be between -70 and 0 LUFS.")
+            return
+        settings.max_downloads = max_downloads
+        settings.log_level = self.log_level_var.get()
+        settings.shuffle_seed = self.seed_var.get().strip()
+        settings.normalize_volume = self.normalize_var.get()
+        settings.target_loudness = target
+        settings.detect_duplicates = self.duplicates_var.get()
+        settings.log_max_mb = log_mb
+        apply_log_settings(settings)
+        settings.artwork_cache_entries = art_entries
+        settings.artwork_disk_cache_mb = art_mb
+        settings.artwork_disk_cache = self.art_disk_var.get()
+        settings.artwork_cache_stats = self.art_stats_var.get()
         
         if self.on_change: self.on_change(settings)
         if self.on_close: self.on_close()
@@ -195,19 +323,52 @@ class SettingsWindow:
         settings.debug_mode = False
         settings.ask_on_delete = True
         #settings.audio_output_device = self.audio_var.get()
-        settings.youtube_cmd = "yt-dlp -x --audio-format mp3 --audio-quality 0 -o \"{out}/%(title)s.%(ext)s\" {url}"
-        settings.spotify_cmd = "spotdl {url} --output \"{out}\" --bitrate 192k"
+        settings.youtube_cmd = DEFAULT_YOUTUBE_CMD
+        settings.spotify_cmd = DEFAULT_SPOTIFY_CMD
+        settings.youtube_in_process = True
         settings.default_volume = 0.5
+        settings.artwork_cache_entries = 64
+        settings.artwork_disk_cache = True
+        settings.artwork_disk_cache_mb = 100
+        settings.artwork_cache_stats = False
+        settings.max_downloads = 3
+        settings.library_roots = []
+        settings.library_auto_import = False
+        settings.library_import_playlist = ''
+        settings.library_watch = False
+        settings.log_level = 'debug'
+        settings.log_max_mb = 5
+        settings.shuffle_seed = ''
+        settings.normalize_volume = True
+        settings.target_loudness = -14.0
+        settings.detect_duplicates = True
+        apply_log_settings(settings)
         
         self.path_var.set(settings.default_download_path)
         self.debug_var.set(settings.debug_mode)
         self.ask_var.set(settings.ask_on_delete)
+        self.in_process_var.set(settings.youtube_in_process)
         #self.audio_var.set(settings.audio_output_device)
         self.yt_cmd.delete(1, "end")
         self.yt_cmd.insert(1, settings.youtube_cmd)
         self.sp_cmd.delete(1, "end")
         self.sp_cmd.insert(1, settings.spotify_cmd)
         self.volume_var.set(int(settings.default_volume*100))
+        self.art_entries_var.set(settings.artwork_cache_entries)
+        self.art_disk_var.set(settings.artwork_disk_cache)
+        self.art_mb_var.set(settings.artwork_disk_cache_mb)
+        self.art_stats_var.set(settings.artwork_cache_stats)
+        self.max_dl_var.set(settings.max_downloads)
+        self.auto_import_var.set(settings.library_auto_import)
+        self.import_playlist_var.set(settings.library_import_playlist)
+        self.watch_var.set(settings.library_watch)
+        self.roots_var.set("")
+        self.log_level_var.set(settings.log_level)
+        self.log_mb_var.set(settings.log_max_mb)
+        self.seed_var.set(settings.shuffle_seed)
+        self.normalize_var.set(settings.normalize_volume)
+        self.target_var.set(settings.target_loudness)
+        self.duplicates_var.set(settings.detect_duplicates)
     
         
         if self.on_change: self.on_change(settings)
@@ -0,0 +1,117 @@
+import random
+
+class ShuffleEngine:
+    """
+    Shuffle order for one Playlist: a Fisher-Yates permutation drawn lazily
+    (one swap-remove per song) plus a play history, so next and previous are
+    O(1) and no song repeats before every song of the cycle was played.
+    Songs added mid-cycle join the current cycle, removed songs are skipped.
+    The playlist is resynced only after its version changed.
+    """
+    history_max = 500
+
+    def __init__(self, playlist, seed=None):
+        self.playlist = playlist
+        self._rng = random.Random(seed)
+        self._ids = set()
+        self._version = None
+        self._pool = []     # ids not played yet in this cycle
+        self._pos = {}      # id -> index in _pool
+        self._history = []  # ids in play order
+        self._cursor = -1   # index in _history of the current song
+        self._peeked = None # drawn for peek() but not played yet
+
+    def _sync(self):
+        if self._version == self.playlist.version:
+            return
+        # walked in playlist (or sorted) order, never set order: string hashing
+        # differs per process, and a fixed shuffle_seed must give the same order
+        order = [s["id"] for s in self.playlist]
+        current = set(order)
+        for sid in sorted(self._ids - current):
+            self._take(sid)
+            if sid == self._peeked:
+                self._peeked = None
+        for sid in order:
+            if sid not in self._ids:
+                self._pos[sid] = len(self._pool)
+                self._pool.append(sid)
+        self._ids = current
+        self._version = self.playlist.version
+
+    def _take(self, sid):
+        # O(1) removal: move the last id into the hole
+        i = self._pos.pop(sid, None)
+        if i is None:
+            return
+        last = self._pool.pop()
+        if last != sid:
+            self._pool[i] = last
+            self._pos[last] = i
+
+    def _draw(self):
+        current = None
+        if not self._pool:
+            # cycle complete: start a new one with every song
+            self._pool = [s["id"] for s in self.playlist]
+            self._pos = {sid: i for i, sid in enumerate(self._pool)}
+            if self._cursor >= 0 and len(self._pool) > 1:
+                current = self._history[self._cursor]
+        if not self._pool:
+            return None
+        # the song that ended the cycle is not drawn first, but stays in the new cycle
+        if current in self._pos:
+            self._take(current)
+        else:
+            current = None
+        sid = self._pool[self._rng.randrange(len(self._pool))]
+        self._take(sid)
+        if current is not None:
+            self._pos[current] = len(self._pool)
+            self._pool.append(current)
+        return sid
+
+    def peek(self):
+        """The song next() would play; the same one until it is played."""
+        self._sync()
+        # after previous(), going forward walks the history again
+        while self._cursor + 1 < len(self._history):
+            sid = self._history[self._cursor + 1]
+            if sid in self._ids:
+                return self.playlist.get(sid)
+            del self._history[self._cursor + 1]
+        if self._peeked is None:
+            self._peeked = self._draw()
+        return self.playlist.get(self._peeked) if self._peeked is not None else None
+
+    def previous(self):
+        """The song played before the current one, or None at the start of the history."""
+        self._sync()
+        cursor = self._cursor
+        while cursor > 0:
+            cursor -= 1
+            sid = self._history[cursor]
+            if sid in self._ids:
+                self._cursor = cursor
+                return self.playlist.get(sid)
+        return None
+
+    def played(self, song):
+        """Record that song started (drawn, walked to, or picked by hand)."""
+        self._sync()
+        sid = song["id"]
+        if 0 <= self._cursor < len(self._history) and self._history[self._cursor] == sid:
+            return
+        if self._cursor + 1 < len(self._history) and self._history[self._cursor + 1] == sid:
+            self._cursor += 1
+            return
+        # a new pick drops the forward history, like a browser
+        del self._history[self._cursor + 1:]
+        self._history.append(sid)
+        if sid == self._peeked:
+            self._peeked = None
+        else:
+            self._take(sid)
+        if len(self._history) > 2 * self.history_max:
+            del self._history[:self.history_max]
+        self._cursor = len(self._history) - 1
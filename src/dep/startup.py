@@ -0,0 +1,45 @@
+import os, sys, time
+
+# imported first by main.py, so this is as close to process start as we get
+_t0 = time.perf_counter()
+_marks = []
+_imports = []
+
+def elapsed():
+    return time.perf_counter() - _t0
+
+def mark(name):
+    """Record a milestone (first frame, interactive, ...)."""
+    _marks.append((name, elapsed()))
+
+class timed_import:
+    """`with timed_import("pygame"): import pygame` records the import time."""
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _imports.append((self.name, time.perf_counter() - self._start))
+        return False
+
+def requested():
+    return "--startup-report" in sys.argv
+
+def report():
+    lines = ["Startup report", f"Python {sys.version.split()[0]} on {sys.platform}", "", "Imports:"]
+    for name, secs in sorted(_imports, key=lambda i: -i[1]):
+        lines.append(f"  {name:<28} {secs * 1000:8.1f} ms")
+    lines.append("")
+    lines.append("Milestones (since process start):")
+    for name, secs in _marks:
+        lines.append(f"  {name:<28} {secs * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+def write_report(path=os.path.join('log', 'startup_report.txt')):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(report() + "\n")
+    return path
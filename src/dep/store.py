@@ -0,0 +1,186 @@
+import sqlite3, threading
+
+from .settings import log_debug, settings
+
+_store_path = 'library.db'
+_schema_version = 1
+
+class LibraryStore:
+    """
+    Playlists and songs in SQLite. Every write is one transaction, so a
+    crash never leaves a half-written library, and single song/playlist
+    changes only touch their own rows. Safe to call from any thread.
+    """
+    def __init__(self, path=_store_path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._snapshot = {}  # playlist -> {id: (name, file)} as last written
+        self._queue = None   # [(position, (playlist, song id))] as last written
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS playlists (
+                    name     TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS songs (
+                    playlist TEXT NOT NULL REFERENCES playlists(name) ON UPDATE CASCADE ON DELETE CASCADE,
+                    id       TEXT NOT NULL,
+                    name     TEXT NOT NULL,
+                    file     TEXT NOT NULL,
+                    PRIMARY KEY (playlist, id)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS play_queue (
+                    position INTEGER PRIMARY KEY,
+                    playlist TEXT NOT NULL,
+                    song_id  TEXT NOT NULL
+                )
+            """)
+
+    @property
+    def initialized(self):
+        return self._conn.execute("PRAGMA user_version").fetchone()[0] >= _schema_version
+
+    def load(self):
+        """{"playlists": {name: [song, ...]}} in the same shape as config.json."""
+        with self._lock:
+            playlists = {}
+            for (name,) in self._conn.execute("SELECT name FROM playlists ORDER BY position"):
+                playlists[name] = []
+            for pname, sid, name, file in self._conn.execute(
+                    "SELECT playlist, id, name, file FROM songs ORDER BY playlist, CAST(id AS INTEGER)"):
+                playlists[pname].append({"id": sid, "name": name, "file": file})
+            self._snapshot = {p: {s["id"]: (s["name"], s["file"]) for s in songs}
+                              for p, songs in playlists.items()}
+        return {"playlists": playlists}
+
+    def replace_all(self, playlists):
+        """Rewrite the whole library in one transaction (migration / reset)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM playlists")
+            self._snapshot = {}
+            for pos, (pname, songs) in enumerate(playlists.items()):
+                self._conn.execute("INSERT INTO playlists (name, position) VALUES (?, ?)", (pname, pos))
+                rows = {s["id"]: (s["name"], s["file"]) for s in songs}
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO songs (playlist, id, name, file) VALUES (?, ?, ?, ?)",
+                    [(pname, sid, name, file) for sid, (name, file) in rows.items()])
+                self._snapshot[pname] = rows
+            self._conn.execute(f"PRAGMA user_version={_schema_version}")
+
+    def sync(self, playlists):
+        """Write only what differs from the last saved state, in one transaction."""
+        with self._lock, self._conn:
+            changes = 0
+            for pname in list(self._snapshot):
+                if pname not in playlists:
+                    self._conn.execute("DELETE FROM playlists WHERE name = ?", (pname,))
+                    del self._snapshot[pname]
+                    changes += 1
+            for pos, (pname, songs) in enumerate(playlists.items()):
+                old = self._snapshot.get(pname)
+                if old is None:
+                    old = self._snapshot[pname] = {}
+                    changes += 1
+                self._conn.execute(
+                    "INSERT INTO playlists (name, position) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET position = excluded.position "
+                    "WHERE position != excluded.position", (pname, pos))
+                current = {}
+                for s in songs:
+                    row = (s["name"], s["file"])
+                    current[s["id"]] = row
+                    if old.get(s["id"]) != row:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO songs (playlist, id, name, file) VALUES (?, ?, ?, ?)",
+                            (pname, s["id"], row[0], row[1]))
+                        changes += 1
+                for sid in old.keys() - current.keys():
+                    self._conn.execute("DELETE FROM songs WHERE playlist = ? AND id = ?", (pname, sid))
+                    changes += 1
+                self._snapshot[pname] = current
+        if settings.debug_mode:
+            log_debug(f"Library saved: {changes} changes")
+
+    def save_song(self, playlist, song, old_id=None):
+        """Insert/update one song; old_id is its previous id after an id change."""
+        row = (song["name"], song["file"])
+        with self._lock, self._conn:
+            if old_id is not None and old_id != song["id"]:
+                self._conn.execute("DELETE FROM songs WHERE playlist = ? AND id = ?", (playlist, old_id))
+                self._snapshot.get(playlist, {}).pop(old_id, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO songs (playlist, id, name, file) VALUES (?, ?, ?, ?)",
+                (playlist, song["id"], row[0], row[1]))
+            self._snapshot.setdefault(playlist, {})[song["id"]] = row
+
+    def delete_song(self, playlist, song_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM songs WHERE playlist = ? AND id = ?", (playlist, song_id))
+            self._snapshot.get(playlist, {}).pop(song_id, None)
+
+    def add_playlist(self, name):
+        with self._lock, self._conn:
+            pos = self._conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM playlists").fetchone()[0]
+            self._conn.execute("INSERT OR IGNORE INTO playlists (name, position) VALUES (?, ?)", (name, pos))
+            self._snapshot.setdefault(name, {})
+
+    def rename_playlist(self, old, new):
+        with self._lock, self._conn:
+            # songs follow through ON UPDATE CASCADE
+            self._conn.execute("UPDATE playlists SET name = ? WHERE name = ?", (new, old))
+            if old in self._snapshot:
+                self._snapshot[new] = self._snapshot.pop(old)
+
+    def delete_playlist(self, name):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM playlists WHERE name = ?", (name,))
+            self._snapshot.pop(name, None)
+
+    def load_queue(self):
+        with self._lock:
+            self._queue = [(pos, (p, sid)) for pos, p, sid in self._conn.execute(
+                "SELECT position, playlist, song_id FROM play_queue ORDER BY position")]
+            return [item for _, item in self._queue]
+
+    def save_queue(self, items):
+        """
+        Write the queue, touching only the rows that changed. Positions only
+        order the rows, so songs played off the head are deleted and the
+        rest keep their rows; only the part after the first difference is
+        rewritten.
+        """
+        items = [tuple(item) for item in items]
+        with self._lock:
+            if self._queue is None:
+                self.load_queue()
+            old = self._queue
+            # head items played since the last write
+            start = next((k for k, (_, item) in enumerate(old) if items and item == items[0]), len(old))
+            kept = 0
+            while start + kept < len(old) and kept < len(items) and old[start + kept][1] == items[kept]:
+                kept += 1
+            if start == 0 and kept == len(old) == len(items):
+                return
+            rows = old[start:start + kept]
+            next_pos = rows[-1][0] + 1 if rows else 0
+            rows += [(next_pos + i, item) for i, item in enumerate(items[kept:])]
+            with self._conn:
+                if start:
+                    first = old[start][0] if start < len(old) else next_pos
+                    self._conn.execute("DELETE FROM play_queue WHERE position < ?", (first,))
+                self._conn.execute("DELETE FROM play_queue WHERE position >= ?", (next_pos,))
+                self._conn.executemany("INSERT INTO play_queue (position, playlist, song_id) VALUES (?, ?, ?)",
+                                       [(pos, p, sid) for pos, (p, sid) in rows[kept:]])
+            self._queue = rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
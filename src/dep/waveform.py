@@ -0,0 +1,132 @@
+import os, hashlib, threading, multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .settings import log_debug, log_error, settings
+
+_waveform_path = 'waveforms'
+
+class WaveformStore:
+    """
+    Waveform overviews per file, keyed by path + size + mtime: memory LRU ->
+    .npy file on disk -> computed in a small process pool. A cached
+    overview is a 2.4 KB read, so it shows as soon as a song starts.
+    """
+    def __init__(self, path=_waveform_path, workers=1, memory=32):
+        self.path = path
+        self.workers = workers
+        self.memory = memory
+        self._lru = OrderedDict()
+        self._pending = {}  # key -> callbacks waiting for it
+        self._lock = threading.Lock()
+        self._pool = None
+        self._closed = False
+
+    def _key(self, file_path):
+        path = os.path.abspath(file_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return hashlib.sha1(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8")).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + ".npy")
+
+    def get(self, file_path):
+        """Cached overview of file_path, or None if it was not computed yet."""
+        key = self._key(file_path)
+        if key is None:
+            return None
+        with self._lock:
+            peaks = self._lru.get(key)
+            if peaks is not None:
+                self._lru.move_to_end(key)
+                return peaks
+        file = self._file(key)
+        if not os.path.exists(file):
+            return None
+        import numpy as np
+        try:
+            peaks = np.load(file)
+        except Exception as e:
+            log_error(f"Broken waveform file {file}: {e}", e)
+            return None
+        self._remember(key, peaks)
+        return peaks
+
+    def _remember(self, key, peaks):
+        with self._lock:
+            self._lru[key] = peaks
+            while len(self._lru) > self.memory:
+                self._lru.popitem(last=False)
+
+    def request(self, file_path, callback=None):
+        """
+        Compute the overview of file_path in the background unless it is
+        cached; callback(file_path, peaks) is called from a pool thread.
+        """
+        key = self._key(file_path)
+        if key is None or self.get(file_path) is not None:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            if key in self._pending:
+                # already computing: just wait for the same result
+                if callback is not None:
+                    self._pending[key].append(callback)
+                return
+            self._pending[key] = [callback] if callback is not None else []
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                # compute_peaks lives in the app-free decode module: workers import only that
+                from .decode import compute_peaks
+                future = self._pool.submit(compute_peaks, file_path)
+            except Exception as e:
+                # a worker died (BrokenProcessPool): the next request starts a new pool
+                log_error(f"Waveform pool failed, restarting it: {e}", e)
+                self._pool = None
+                del self._pending[key]
+                return
+        future.add_done_callback(lambda f: self._finished(f, file_path, key))
+
+    def _finished(self, future, file_path, key):
+        with self._lock:
+            callbacks = self._pending.pop(key, [])
+        if future.cancelled():
+            return
+        try:
+            peaks = future.result()
+        except Exception as e:
+            log_error(f"Waveform failed for {file_path}: {e}", e)
+            return
+        self._save(key, peaks)
+        self._remember(key, peaks)
+        if settings.debug_mode:
+            log_debug(f"Waveform computed ({len(peaks)} buckets): {file_path}")
+        for callback in callbacks:
+            callback(file_path, peaks)
+
+    def _save(self, key, peaks):
+        import numpy as np
+        file = self._file(key)
+        try:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            # write then rename, so a crash never leaves half a file behind
+            tmp = file + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, peaks)
+            os.replace(tmp, file)
+        except OSError as e:
+            log_error(f"Failed to store waveform {file}: {e}", e)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+waveform_store = WaveformStore()
@@ -1,60 +1,73 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import customtkinter as ctk
-from PIL import Image
+from dep import startup
 
-import pygame
 import os, sys
-import random
 import time as t
-import subprocess
 import threading
 import re
+import queue
+import multiprocessing
 
-from mutagen import File as MutagenFile
-from mutagen.id3 import ID3, APIC, USLT
-from termcolor import colored
-from datetime import datetime
-
-from dep.config import *
-from dep.settings import *
-
-from ui.widget.listBox import RoundedListbox
-
-pygame.mixer.init()
-
-ctk.set_appearance_mode("dark")
-ctk.set_widget_scaling(1.1)
-
-def extract_metadata(file_path):
-    """
-    Read ID3 tags (title, artist, album, duration, cover, lyrics)
-    Returns a metadata dict (might be empty).
-    """
-    meta = {}
-    try:
-        audio = MutagenFile(file_path, easy=True)
-        tags  = audio.tags or {}
-        meta["title"]    = tags.get("title",   [os.path.basename(file_path)])[0]
-        meta["artist"]   = tags.get("artist",  ["Unknown Artist"])[0]
-        meta["album"]    = tags.get("album",   [""])[0]
-        meta["duration"] = int(audio.info.length) if audio.info else 0
-
-        # now load ID3 frames for cover & lyrics
-        id3 = ID3(file_path)
-        pic = id3.getall("APIC")
-        if pic:
-            meta["cover_data"] = pic[0].data
-        usl = id3.getall("USLT")
-        if usl:
-            meta["lyrics"] = usl[0].text
-        tcon = id3.getall("TCON")
-        if tcon:
-            meta["genre"] = tcon[0].text
-    except Exception:
-        pass
-
-    return meta
+# Loudness and waveform analysis run in spawned worker processes, which
+# re-import this file as __mp_main__. Tk, the settings and every module
+# that opens a database or starts a thread are only loaded by the app itself.
+if __name__ == "__main__":
+    # in the frozen exe a worker runs this file as __main__: freeze_support()
+    # turns it into the worker right here, before anything is imported
+    multiprocessing.freeze_support()
+    with startup.timed_import("tkinter"):
+        import tkinter as tk
+        from tkinter import ttk, messagebox
+    with startup.timed_import("customtkinter"):
+        import customtkinter as ctk
+    with startup.timed_import("PIL"):
+        from PIL import Image
+
+    with startup.timed_import("dep.settings"):
+        from dep.settings import *
+    with startup.timed_import("dep.config"):
+        from dep.config import *
+    with startup.timed_import("dep.metadata"):
+        from dep.metadata import *
+    with startup.timed_import("dep.playlist"):
+        from dep.playlist import Playlist
+    with startup.timed_import("dep.shuffle"):
+        from dep.shuffle import ShuffleEngine
+    with startup.timed_import("dep.playqueue"):
+        from dep.playqueue import PlayQueue
+    with startup.timed_import("dep.search"):
+        from dep.search import SearchIndex, SearchWorker
+    with startup.timed_import("dep.scanner"):
+        from dep.scanner import MetadataScanner
+    with startup.timed_import("dep.artwork"):
+        from dep.artwork import artwork_cache
+    with startup.timed_import("dep.downloads"):
+        from dep.downloads import DownloadJob, download_manager, CANCELLED, FAILED
+    with startup.timed_import("dep.library"):
+        from dep.library import LibraryScanner, LibraryWatcher
+    with startup.timed_import("dep.playback"):
+        from dep.playback import playback_engine, STARTED, ADVANCED, ENDED, LENGTH
+        from dep.playback import FAILED as PLAYBACK_FAILED
+    with startup.timed_import("dep.loudness"):
+        from dep.loudness import loudness_analyzer
+    with startup.timed_import("dep.waveform"):
+        from dep.waveform import waveform_store
+    with startup.timed_import("dep.duplicates"):
+        from dep.duplicates import duplicate_detector
+
+    with startup.timed_import("ui.widget"):
+        from ui.widget.listBox import RoundedListbox
+        from ui.widget.metadataCard import MetadataCard
+        from ui.widget.virtualTree import VirtualTreeview
+        from ui.widget.downloadPanel import DownloadPanel
+        from ui.widget.queuePanel import QueuePanel
+        from ui.widget.duplicatesPanel import DuplicatesPanel
+        from ui.widget.waveform import WaveformView
+        from ui.dispatcher import UIDispatcher
+
+    startup.mark("imports")
+
+    ctk.set_appearance_mode("dark")
+    ctk.set_widget_scaling(1.1)
 
 def resource_path(relative):
     """
@@ -76,11 +89,7 @@ class Song:
         self.name = name
         self.file = file
     def play(self):
-        try:
-            pygame.mixer.music.load(self.file)
-            pygame.mixer.music.play()
-        except Exception as e:
-            messagebox.showerror("Error", f"OK: {e}")
+        playback_engine.load({"id": self.song_id, "name": self.name, "file": self.file})
             
 
 class App:
@@ -91,13 +100,21 @@ class App:
         self.data = load_config()
         if "playlists" not in self.data:
             self.data["playlists"] = {}
-        self.playlists = self.data["playlists"]
+        self.playlists = {name: Playlist(songs) for name, songs in self.data["playlists"].items()}
         
-        for plist in self.playlists.values():
-            for song in plist:
-                if not isinstance(song, dict) or not song.get("metadata"):
-                    song["metadata"] = extract_metadata(song["file"])
-
+        # metadata is filled in by a background scan once the window is up
+        self.scanner = None
+        self._scan_targets = {}
+        self.download_panel = None
+        self.library = LibraryScanner()
+        # every widget update from a worker thread goes through the dispatcher
+        self.dispatcher = UIDispatcher(root)
+        self.library_watcher = LibraryWatcher(
+            self.library, on_files=lambda files: self.dispatcher.call(self._import_library_files, files))
+        playback_engine.on_event = lambda: self.dispatcher.call(self._pump_events, key="playback")
+        playback_engine.gain_of = loudness_analyzer.gain
+        pending_songs = [song for plist in self.playlists.values()
+                         for song in plist if not song.get("metadata")]
         
         self.selected_playlist = None
         self.current_song = None
@@ -105,10 +122,25 @@ class App:
         self.current_song_index = None
         self.is_paused = False
         self.slider_updating = False
-        self.start_time = 0
-        self.seek_offset = 0
-        self.paused_position = None
+        self.preloaded = None  # song queued in the mixer to follow the current one
+        self._tick_job = None
+        self._shown_second = None
+        self.playing_playlist = None  # playlist the current song was started from
+        self._preloaded_from = (None, False)
+        self.queue_panel = None
+        self.duplicates_panel = None
+        self._new_duplicates = []  # (playlist, new song, library files with the same audio)
+        self.play_queue = PlayQueue(self._resolve_queued, library_store.load_queue())
+        self._queue_saved = self.play_queue.version
+        # the index is built in the background; searches run on their own thread
+        self.search_index = SearchIndex()
+        self.search_worker = SearchWorker(
+            self.search_index, lambda q, r: self.dispatcher.call(self._show_search_results, q, r, key="search"))
+        self._search_job = None
+        self._search_results = []
         self.shuffle_mode = tk.BooleanVar(value=False)
+        self._shuffles = {}  # playlist name -> ShuffleEngine
+        self.shuffle_mode.trace_add("write", lambda *_: self._preload_next())
         #self.ask_on_delete = tk.BooleanVar(value=settings.ask_on_delete)
         self.root.configure(fg_color="#000000")
         font_primary = ("Helvetica Neue", 14)
@@ -123,6 +155,7 @@ class App:
         
         self.meta_frame = ctk.CTkFrame(self.main_frame, fg_color="#282828", width=290)
         self.meta_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(10,0))
+        self.metadata_card = MetadataCard(self.meta_frame, self.format_time)
 
         
         #self.right_frame = ctk.CTkFrame(self.main_frame, fg_color="#ffffff")
@@ -144,13 +177,22 @@ class App:
         ctk.CTkButton(self.left_frame, text="Add Playlist", command=self.add_playlist).pack(fill=tk.X, padx=5, pady=2)
         ctk.CTkButton(self.left_frame, text="Remove Playlist", command=self.remove_playlist).pack(fill=tk.X, padx=5, pady=2)
         ctk.CTkButton(self.left_frame, text="Rename Playlist", command=self.rename_playlist).pack(fill=tk.X, padx=5, pady=2)
-        ctk.CTkButton(self.left_frame, text="Settings", command=self.open_settings).pack(fill=tk.X, padx=5, pady=20)
+        ctk.CTkButton(self.left_frame, text="Downloads", command=self.open_downloads).pack(fill=tk.X, padx=5, pady=(20,2))
+        ctk.CTkButton(self.left_frame, text="Queue", command=self.open_queue).pack(fill=tk.X, padx=5, pady=2)
+        ctk.CTkButton(self.left_frame, text="Scan Library", command=self.scan_library).pack(fill=tk.X, padx=5, pady=2)
+        ctk.CTkButton(self.left_frame, text="Find Duplicates", command=self.find_duplicates).pack(fill=tk.X, padx=5, pady=2)
+        ctk.CTkButton(self.left_frame, text="Settings", command=self.open_settings).pack(fill=tk.X, padx=5, pady=(2,20))
 
         # Info label
         self.label_info = ctk.CTkLabel(self.left_frame, text="Hello World", font=("Helvetica", 10), text_color="#ffffff", fg_color="transparent")
         self.label_info.pack(fill=tk.Y, padx=1, pady=2)
         self.update_label_info(self.label_info)
 
+        # Library scan progress (hidden when idle)
+        self.scan_label = ctk.CTkLabel(self.left_frame, text="", font=("Helvetica", 10), text_color="#d1d1d1", fg_color="transparent")
+        self.scan_progress = ctk.CTkProgressBar(self.left_frame, mode="determinate", height=6)
+        self.scan_progress.set(0)
+
         # Style for the Treeview
         style = ttk.Style(root)
         style.theme_use("clam")
@@ -181,18 +223,55 @@ class App:
         style.configure("hover",    background="#333333")
         style.configure("selected", background="#2e2e2e")
         
+        # Search box: filters the whole library as you type
+        # (no textvariable: CTkEntry hides its placeholder when one is set)
+        self.search_entry = ctk.CTkEntry(self.center_frame, placeholder_text="Search library")
+        self.search_entry.pack(fill=tk.X, padx=5, pady=(5,0))
+        self.search_entry.bind("<KeyRelease>", lambda e: self._schedule_search())
+        self.search_entry.bind("<Escape>", lambda e: self.clear_search())
+        self.search_entry.bind("<Return>", lambda e: self.play_search_result(0))
+
         # Create the Treeview
-        self.song_tree = ttk.Treeview(self.center_frame, columns=("ID", "Name", "Play"), show="headings", style="BW.Treeview", selectmode="browse")
+        # Only the visible rows exist as Treeview items, the rest is scrolled through
+        self.song_frame = ctk.CTkFrame(self.center_frame, fg_color="transparent")
+        self.song_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.song_tree = VirtualTreeview(self.song_frame, columns=("ID", "Name", "Play"), show="headings", style="BW.Treeview", selectmode="browse",
+                                         key=lambda s: s["id"], values=lambda s: (s["id"], s["name"], "▶"))
+        self.song_scrollbar = ctk.CTkScrollbar(self.song_frame, orientation=tk.VERTICAL, command=self.song_tree.yview)
+        self.song_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.song_tree.configure_yscroll(self.song_scrollbar.set)
         self.song_tree.heading("ID", text="ID")
         self.song_tree.heading("Name", text="Name")
         self.song_tree.heading("Play", text="")
         self.song_tree.column("ID", width=30, anchor="center")
         self.song_tree.column("Play", width=30, anchor="center")
-        self.song_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.song_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.song_tree.bind("<Double-1>", self.edit_song)
         self.song_tree.bind("<Button-1>", self.on_treeview_click)
+        self.song_tree.bind("<Button-3>", self.on_song_menu)
+        self.song_menu = tk.Menu(self.root, tearoff=0)
+        self.song_menu.add_command(label="Play", command=self.play_song)
+        self.song_menu.add_command(label="Play Next", command=lambda: self.queue_selected(play_next=True))
+        self.song_menu.add_command(label="Add to Queue", command=self.queue_selected)
+        self.song_menu.add_separator()
+        self.song_menu.add_command(label="Show Queue", command=self.open_queue)
         self.song_tree.tag_configure("current", background="#242424", foreground="#1ed760")
-        
+
+        # search results replace the song list while there is a query; rows are result positions
+        self.search_frame = ctk.CTkFrame(self.center_frame, fg_color="transparent")
+        self.search_tree = VirtualTreeview(self.search_frame, columns=("Name", "Artist", "Playlist", "Play"), show="headings", style="BW.Treeview", selectmode="browse",
+                                           values=self._search_row)
+        search_scrollbar = ctk.CTkScrollbar(self.search_frame, orientation=tk.VERTICAL, command=self.search_tree.yview)
+        search_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.search_tree.configure_yscroll(search_scrollbar.set)
+        for col, text in (("Name", "Name"), ("Artist", "Artist"), ("Playlist", "Playlist"), ("Play", "")):
+            self.search_tree.heading(col, text=text)
+        self.search_tree.column("Playlist", width=100, anchor="center")
+        self.search_tree.column("Play", width=30, anchor="center")
+        self.search_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.search_tree.bind("<Double-1>", lambda e: self.reveal_search_result(self.search_tree.key_at(e.y)))
+        self.search_tree.bind("<Button-1>", self.on_search_click)
+
         self.import_frame = ctk.CTkFrame(self.center_frame, fg_color="transparent")
         self.import_frame.pack(fill=tk.X, padx=5, pady=2)
         ctk.CTkButton(self.import_frame, text="Import Song", command=self.import_song).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
@@ -230,7 +309,6 @@ class App:
         ctk.CTkLabel(self.control_frame, text="Volume", font=font_primary, text_color="#ffffff", fg_color="transparent").pack(side=tk.LEFT, padx=8)
         self.volume_slider = ctk.CTkSlider(self.control_frame, from_=0, to=100, orientation=tk.HORIZONTAL, width=130, command=self.change_volume)
         self.volume_slider.set( settings.default_volume * 100 )
-        pygame.mixer.music.set_volume(settings.default_volume)
         self.volume_slider.pack(side=tk.LEFT, padx=4)
         self.volume_label = ctk.CTkLabel(self.control_frame, text=str(int(settings.default_volume*100))+"%", font=font_primary, text_color="#ffffff", fg_color="transparent")
         self.volume_label.pack(side=tk.LEFT, padx=8)
@@ -238,6 +316,10 @@ class App:
         self.now_playing_label = ctk.CTkLabel(self.center_frame, text="Now Playing: None", font=("Helvetica Bold", 16), text_color="#ffffff", fg_color="transparent")
         self.now_playing_label.pack(pady=(5, 0))
         
+        # peak overview of the current song, right above the slider it follows
+        self.waveform = WaveformView(self.center_frame, on_seek=self._seek_fraction)
+        self.waveform.pack(fill=tk.X, padx=12, pady=(5, 0))
+
         # create the slider
         self.slider = ctk.CTkSlider(self.center_frame,
                                 from_=0,
@@ -257,8 +339,109 @@ class App:
         self.slider_time_label.pack(pady=(0, 10))
         
         self.refresh_playlists()
-        self.update_slider()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # the playback tick slows down while minimized, pick the fast rate up again when shown
+        self.root.bind("<Map>", lambda e: self._schedule_tick() if e.widget is self.root else None, add="+")
+        startup.mark("window built")
+        # the mixer, scans and timers are not needed to draw the first frame
+        self.root.after(1, self._finish_startup, pending_songs)
+
+    def _finish_startup(self, pending_songs):
+        self.root.update_idletasks()
+        startup.mark("first frame")
+        # starts the playback thread, which initialises the mixer
+        playback_engine.set_volume(self.volume_slider.get() / 100)
+        threading.Thread(target=self._build_search_index,
+                         args=({name: list(songs) for name, songs in self.playlists.items()},),
+                         daemon=True).start()
+        self.start_metadata_scan(pending_songs)
+        self.analyze_loudness()
+        self.hash_library()
+        if settings.library_auto_import:
+            self.scan_library()
+        startup.mark("interactive")
+        if startup.requested() or settings.debug_mode:
+            log_info(f"Startup report written to {startup.write_report()}")
+
+    def start_metadata_scan(self, songs):
+        if not songs:
+            return
+        files = []
+        for song in songs:
+            if song["file"] not in self._scan_targets:
+                files.append(song["file"])
+            self._scan_targets.setdefault(song["file"], []).append(song)
+        if self.scanner is not None:
+            # a scan is already running: just queue more files
+            self.scanner.start(files)
+            return
+        self.scanner = MetadataScanner(metadata_index)
+        self.scanner.start(files)
+        self.scan_label.pack(fill=tk.X, padx=5, pady=(2,0))
+        self.scan_progress.pack(fill=tk.X, padx=5, pady=(0,5))
+        self.root.after(100, self._poll_scan)
+
+    def _poll_scan(self):
+        scanner = self.scanner
+        if scanner is None:
+            return
+        batch = scanner.drain()
+        for path, meta in batch:
+            for song in self._scan_targets.pop(path, ()):
+                song["metadata"] = meta
+                self.search_index.update(song)
+                if song is self.current_song:
+                    self.show_metadata_card(song)
+        if batch:
+            self._refresh_search()
+
+        if scanner.total:
+            self.scan_progress.set(scanner.done / scanner.total)
+        self.scan_label.configure(text=f"Scanning library {scanner.done}/{scanner.total}")
+
+        if scanner.finished:
+            if settings.debug_mode:
+                log_info(f"Metadata scan finished: {scanner.total} files")
+            self.scan_label.pack_forget()
+            self.scan_progress.pack_forget()
+            self.scanner = None
+            return
+        self.root.after(100, self._poll_scan)
+
+    def analyze_loudness(self):
+        """Measure the loudness of library files not analysed yet (no-op when normalization is off)."""
+        loudness_analyzer.analyze(self._library_files())
+
+    def _library_files(self):
+        return [s["file"] for plist in self.playlists.values() for s in plist]
+
+    def hash_library(self):
+        """Hash library files not hashed yet, so new songs can be checked against them."""
+        if not settings.detect_duplicates:
+            return
+        threading.Thread(target=duplicate_detector.hash_all, args=(self._library_files(),), daemon=True).start()
+
+    def scan_library(self):
+        """Index the library folders in the background and import new files."""
+        if settings.library_watch:
+            self.library_watcher.start()
+        else:
+            self.library_watcher.scan_now()
+
+    def _import_library_files(self, files):
+        target = settings.library_import_playlist or self.selected_playlist
+        if not target:
+            return
+        if target not in self.playlists:
+            self.playlists[target] = Playlist()
+            self.refresh_playlists()
+        known = {os.path.abspath(s["file"]) for plist in self.playlists.values() for s in plist}
+        new_files = [f for f in files if os.path.abspath(f) not in known]
+        if new_files:
+            log_info(f"Importing {len(new_files)} new files into '{target}'")
+            self.add_files(target, new_files)
+        # only now are they stored, so files that found no playlist are reported again
+        threading.Thread(target=self.library.record, args=(files,), daemon=True).start()
 
     def _on_app_focus(self):
         # if something’s playing *and* it has metadata, re-show its card
@@ -279,12 +462,11 @@ class App:
     def on_treeview_click(self, event):
         region = self.song_tree.identify("region", event.x, event.y)
         if region == "cell" and self.song_tree.identify_column(event.x) == "#3":
-            item = self.song_tree.identify_row(event.y)
-            if item:
-                for s in self.playlists[self.selected_playlist]:
-                    if s["id"] == item:
-                        self.play_song(s)
-                        return "break"
+            item = self.song_tree.key_at(event.y)
+            song = self.playlists[self.selected_playlist].get(item) if item else None
+            if song:
+                self.play_song(song)
+                return "break"
     
     def ensure_selection(self):
         if self.playlist_listbox.size() > 0:
@@ -303,29 +485,23 @@ class App:
         sel = self.playlist_listbox.curselection()
         self.selected_playlist = self.playlist_listbox.get(sel[0])        
         self.refresh_songs()
-        if self.current_song and any(s["id"] == self.current_song["id"]
-                                      for s in self.playlists[self.selected_playlist]):
+        if self.current_song and self.current_song in self.playlists[self.selected_playlist]:
             sid = self.current_song["id"]
-            self.song_tree.selection_set(sid)
+            self.song_tree.select(sid)
             self.update_highlight()
             self.show_metadata_card(self.current_song)
         else:
-            for w in self.meta_frame.winfo_children(): w.destroy()
-        
-        self.refresh_songs()
+            self.metadata_card.clear()
 
     def refresh_songs(self):
-        self.song_tree.delete(*self.song_tree.get_children())
-        songs = self.playlists.get(self.selected_playlist, [])
-        for song in sorted(songs, key=lambda s: int(s["id"])):
-            self.song_tree.insert("", tk.END, iid=song["id"], values=(song["id"], song["name"], "▶"))
+        songs = self.playlists.get(self.selected_playlist) or Playlist()
+        self.song_tree.set_items(songs, index_of=songs.index_of)
 
     def update_highlight(self):
-        for item in self.song_tree.get_children():
-            if self.current_song and item == self.current_song["id"]:
-                self.song_tree.item(item, tags=("current",))
-            else:
-                self.song_tree.item(item, tags=())
+        # ids repeat across playlists: only highlight when the current song is in the one shown
+        songs = self.playlists.get(self.selected_playlist)
+        current = self.current_song if songs is not None and self.current_song in songs else None
+        self.song_tree.set_highlight(current["id"] if current else None)
 
 
     def add_playlist(self):
@@ -338,7 +514,8 @@ class App:
     def _save_new_playlist(self, top, var):
         name = var.get().strip()
         if not name or name in self.playlists: return
-        self.playlists[name] = []
+        self.playlists[name] = Playlist()
+        library_store.add_playlist(name)
         self.refresh_playlists()
         top.destroy()
 
@@ -364,14 +541,11 @@ class App:
 
         for s in songs:
             if self.current_song and self.current_song["file"] == s["file"]:
-                pygame.mixer.music.stop()
-                try:
-                    pygame.mixer.music.unload()
-                except:
-                    pass
+                playback_engine.stop(wait=True)
                 self.current_song = None
                 self.now_playing_label.configure(text="Now Playing: None")
                 self.slider.set(0)
+                self.waveform.clear()
 
             if delete_files:
                 try:
@@ -383,6 +557,10 @@ class App:
 
         if name in self.playlists:
             del self.playlists[name]
+            self._shuffles.pop(name, None)
+            self.search_index.remove_playlist(songs)
+            self._refresh_search()
+            library_store.delete_playlist(name)
 
         self.refresh_playlists()
 
@@ -400,6 +578,15 @@ class App:
                     messagebox.showerror("Error", "Playlist name already exists")
                     return
                 self.playlists[new_name] = self.playlists.pop(old_name)
+                if old_name in self._shuffles:
+                    self._shuffles[new_name] = self._shuffles.pop(old_name)
+                if self.playing_playlist == old_name:
+                    self.playing_playlist = new_name
+                self.play_queue.rename_playlist(old_name, new_name)
+                self._queue_changed(preload=False)
+                library_store.rename_playlist(old_name, new_name)
+                self.search_index.rename_playlist(old_name, new_name)
+                self._refresh_search()
                 self.refresh_playlists()
                 top.destroy()
             top = ctk.CTkToplevel(self.root)
@@ -410,279 +597,321 @@ class App:
             ctk.CTkButton(top, text="Save", font=("Arial", 12), command=save, fg_color="#cccccc").pack(padx=5, pady=5)
 
     def download_song_spotify(self, link=None):
-        top = ctk.CTkToplevel(self.root)
-        
-        style = ttk.Style()
-        style.configure('Custom.TButton', font=('Helvetica', 9), padding=(5, 1))
+        self._download_dialog("spotify", "Download Song from Spotify", "Spotify URL:", link)
 
-        
-        top.title("Download Song from Spotify")
+    def download_song(self, link=None):
+        self._download_dialog("youtube", "Download Song from YouTube", "YouTube URL:", link)
+
+    def _download_dialog(self, kind, title, label, link=None):
+        top = ctk.CTkToplevel(self.root)
+        top.title(title)
         top.attributes('-topmost', True)
         top.resizable(False, False)
-        ctk.CTkLabel(top, text="Spotify URL:", font=("Arial", 12)).pack(padx=5, pady=5)
-        if link is None:
-            url_var = tk.StringVar()
-        else:
-            url_var = tk.StringVar(value=link)
+        ctk.CTkLabel(top, text=label, font=("Arial", 12)).pack(padx=5, pady=5)
+        url_var = tk.StringVar(value=link or "")
         ctk.CTkEntry(top, textvariable=url_var, width=370).pack(padx=5, pady=5)
-        
-        progress_label = ctk.CTkLabel(top, text="Idle", font=("Arial", 12))
-        progress_label.pack(padx=5, pady=5)
-        progress_bar = ctk.CTkProgressBar(top, mode='indeterminate')
-        progress_bar.pack(padx=5, pady=5, fill=tk.X)
-        cancel_btn = ctk.CTkButton(top, text="Cancel")
-        cancel_btn.pack(padx=5, pady=5)
-        
+
         def start_download():
             url = url_var.get().strip()
             if not url:
-                messagebox.showerror("Error", "Spotify URL cannot be empty")
+                messagebox.showerror("Error", "URL cannot be empty")
                 return
+            self.queue_download(kind, url)
+            top.destroy()
 
-            sound_dir = settings.default_download_path
-            os.makedirs(sound_dir, exist_ok=True)
-            start_ts = t.time()
-
-            command = settings.spotify_cmd.replace("{url}", url).replace("{out}", sound_dir)
-            if settings.debug_mode:
-                log_debug(f"Downloading Spotify song with command: {command}")
+        ctk.CTkButton(top, text="Download", command=start_download).pack(padx=5, pady=5)
+        ctk.CTkButton(top, text="Cancel", command=top.destroy).pack(padx=5, pady=5)
+
+    def queue_download(self, kind, url, playlist=None):
+        # the target playlist is fixed when the job is queued, not when it finishes
+        job = DownloadJob(kind, url, settings.default_download_path,
+                          playlist=playlist or self.selected_playlist,
+                          on_done=lambda job: self.dispatcher.call(self._on_download_done, job))
+        download_manager.submit(job)
+        self.open_downloads()
+        return job
+
+    def open_downloads(self):
+        if self.download_panel is None:
+            self.download_panel = DownloadPanel(self.root, download_manager, on_close=self._on_downloads_closed)
+        else:
+            self.download_panel.lift()
 
-            progress_bar.start()
-            progress_label.configure(text="Downloading...")
-            process = subprocess.Popen(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True
-            )
-            stdout, stderr = process.communicate()
-            progress_bar.stop()
+    def _on_downloads_closed(self):
+        self.download_panel = None
 
-            if process.returncode != 0:
+    def _on_download_done(self, job):
+        if job.state == CANCELLED:
+            if settings.debug_mode:
+                log_info(f"Download cancelled: {job.url}")
+            return
+        if job.parent is not None and job.state == FAILED:
+            # one failed item of a playlist/album should not pop up a dialog
+            log_error(f"Download failed: {job.url}: {job.stderr}", job.stderr)
+            return
+        if job.state == FAILED:
+            if job.kind == "spotify":
                 messagebox.showerror("Error", "Song not found or private playlist")
                 if settings.debug_mode:
-                    log_info(f"spotdl stderr:\n{stderr}")
-                top.destroy()
-                return
-
-            top.destroy()
-
-            audio_exts = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')
-            new_files = []
-            for fn in os.listdir(sound_dir):
-                if not fn.lower().endswith(audio_exts):
-                    continue
-                full_path = os.path.join(sound_dir, fn)
-                try:
-                    mtime = os.path.getmtime(full_path)
-                except OSError:
-                    continue
-                if mtime >= start_ts:
-                    new_files.append(fn)
-
-            if settings.debug_mode:
-                log_info(f"Files in dir after download: {os.listdir(sound_dir)}")
-                log_info(f"New files by timestamp: {new_files}")
-
-            if not new_files:
-                m = re.search(r'[^\s]*file already exists[^\s]*', stdout)
-                if m:
-                    messagebox.showwarning("Warning", "File already exists.")
-                    ''' if not messagebox.askyesno("Warning", "File already exists, overwrite?"):
-                        top.destroy()
-                        return
-                    else:
-                        if settings.debug_mode:
-                            log_info("File already exists, overwriting...")
-                        self.download_song_spotify(arg="") '''
-                    if settings.debug_mode:
-                        log_info("File already exists.")
-                messagebox.showwarning("Warning", "No new audio files found. \n Song is not available or it's caused by a yt-dlp error. \n Check error_log.txt")
-                
+                    log_info(f"spotdl stderr:\n{job.stderr}")
+            else:
+                messagebox.showerror("Error", f"Download failed: {job.stderr}")
                 if settings.debug_mode:
-                    log_info("No new files found. Song is not available.")
-                    log_debug(f"Use command: - {command} - on your terminal to check for errors.")
-                    
-                    log_error(f"spotdl stderr:\n{stdout}", stdout)
-                    
-                m = re.search(r'https://[^\s]*youtube[^\s]*', stdout)
-                if m and not messagebox.askyesno("Try with YT", "Do you want to try with YouTube? (Recommended)"):
-                    top.destroy()
-                    return
-                elif m:
-                    if settings.debug_mode:
-                        log_info("Trying with yt-dlp. Command: " + m)
-                    self.download_song(link=m.group(0))
-                else:
-                    top.destroy()
-                    return
-                        
-                return
+                    log_error(f"Download failed: {job.stderr}", job.stderr)
+            return
 
-            if self.selected_playlist is None:
-                messagebox.showwarning("Warning", "Select a playlist first")
-                if settings.debug_mode:
-                    log_info("No playlist selected")
-                return
+        if job.items:
+            if settings.debug_mode:
+                log_info(f"{job.url} split into {len(job.items)} downloads")
+            return
 
-            for fn in sorted(new_files):
-                file_path = os.path.join(sound_dir, fn)
+        if not job.files:
+            if job.kind == "spotify" and job.parent is None:
+                self._on_spotify_no_files(job)
+            return
 
-                audio = MutagenFile(file_path, easy=True)
-                tags = audio.tags or {}
-                title    = tags.get('title',   [fn])[0]
-                artist   = tags.get('artist',  ['Unknown Artist'])[0]
-                album    = tags.get('album',   [''])[0]
-                duration = int(audio.info.length) if audio.info else 0
+        if job.playlist is None or job.playlist not in self.playlists:
+            messagebox.showwarning("Warning", "Select a playlist first")
+            if settings.debug_mode:
+                log_info("No playlist selected")
+            return
+        self.add_files(job.playlist, job.files, use_title=job.kind == "spotify")
+
+    def _on_spotify_no_files(self, job):
+        if settings.debug_mode:
+            log_info(f"No new files for {job.url}")
+        m = re.search(r'[^\s]*file already exists[^\s]*', job.stdout)
+        if m:
+            messagebox.showwarning("Warning", "File already exists.")
+            if settings.debug_mode:
+                log_info("File already exists.")
+        messagebox.showwarning("Warning", "No new audio files found. \n Song is not available or it's caused by a yt-dlp error. \n Check error_log.txt")
 
-                cover_data = None
-                lyrics     = None
-                try:
-                    id3 = ID3(file_path)
-                    pics = id3.getall('APIC')
-                    if pics:
-                        cover_data = pics[0].data
-                    usl = id3.getall('USLT')
-                    if usl:
-                        lyrics = usl[0].text
-                except:
-                    pass
-
-                default_id = str(len(self.playlists[self.selected_playlist]) + 1)
-                new_song = {
-                    "id": default_id,
-                    "name": title,
-                    "file": file_path,
-                    "metadata": {
-                        "title": title,
-                        "artist": artist,
-                        "album": album,
-                        "duration": duration,
-                        "cover_data": cover_data,
-                        "lyrics": lyrics
-                    }
-                }
-                self.playlists[self.selected_playlist].append(new_song)
+        if settings.debug_mode:
+            log_info("No new files found. Song is not available.")
+            log_debug(f"Use command: - {job.command()} - on your terminal to check for errors.")
+            log_error(f"spotdl stderr:\n{job.stdout}", job.stdout)
 
-            self.refresh_songs()
-            save_config_rt(self.playlists)
+        m = re.search(r'https://[^\s]*youtube[^\s]*', job.stdout)
+        if m and messagebox.askyesno("Try with YT", "Do you want to try with YouTube? (Recommended)"):
+            if settings.debug_mode:
+                log_info("Trying with yt-dlp: " + m.group(0))
+            self.queue_download("youtube", m.group(0), job.playlist)
+
+    def add_files(self, playlist_name, files, use_title=False):
+        playlist = self.playlists[playlist_name]
+        library = {os.path.abspath(f) for f in self._library_files()} if settings.detect_duplicates else None
+        added = []
+        pending = []
+        for file_path in files:
+            name = os.path.basename(file_path)
+            song = {"id": playlist.allocate_id(), "name": name, "file": file_path}
+            if use_title:
+                song["metadata"] = metadata_index.load(file_path)
+                song["name"] = song["metadata"].get("title", name)
+            else:
+                # tags are read by the background scan
+                song["name"] = os.path.splitext(name)[0]
+                pending.append(song)
+            playlist.add(song)
+            self.search_index.add(playlist_name, song)
+            added.append(song)
+        self.start_metadata_scan(pending)
+        loudness_analyzer.analyze(files)
+        if library is not None:
+            threading.Thread(target=self._check_duplicates, args=(playlist_name, added, library), daemon=True).start()
+
+        # several downloads finishing together redraw and save once
+        if playlist_name == self.selected_playlist:
+            self.dispatcher.call(self._songs_changed, key="songs_changed")
+        self._refresh_search()
+        self.dispatcher.call(save_config_rt, self.playlists, key="save_config")
+
+    def _check_duplicates(self, playlist_name, songs, library):
+        # the new files are hashed in parallel, once; the library was hashed at startup
+        duplicate_detector.hash_all([song["file"] for song in songs])
+        found = []
+        for song in songs:
+            same = duplicate_detector.matches(song["file"], library)
+            if same:
+                found.append((playlist_name, song, same))
+        if found:
+            self.dispatcher.call(self._note_duplicates, found)
+
+    def _note_duplicates(self, found):
+        # several downloads finishing together are reported in one dialog
+        self._new_duplicates.extend(found)
+        self.dispatcher.call(self._warn_duplicates, key="duplicates_found")
+
+    def _warn_duplicates(self):
+        found, self._new_duplicates = self._new_duplicates, []
+        by_file = self._songs_by_file()
+        # the user may have removed them in the meantime
+        found = [(p, song, same) for p, song, same in found if song in self.playlists.get(p, ())]
+        if not found:
+            return
+        lines = []
+        for playlist_name, song, same in found[:5]:
+            others = [f"'{s['name']}' ({p})" for path in same for p, s in by_file.get(path, ())]
+            lines.append(f"'{song['name']}' is the same audio as {', '.join(others[:2]) or os.path.basename(same[0])}")
+        if len(found) > 5:
+            lines.append(f"... and {len(found) - 5} more")
+        log_info(f"{len(found)} added songs are already in the library")
+        if messagebox.askyesno("Duplicates", "Already in the library:\n" + "\n".join(lines) +
+                               "\n\nRemove the new copies from the library?"):
+            delete_file = messagebox.askyesno("File", "Also delete the new files from disk?")
+            for playlist_name, song, _ in found:
+                self._drop_song(playlist_name, song, delete_file)
+
+    def _songs_by_file(self):
+        by_file = {}
+        for name, plist in self.playlists.items():
+            for song in plist:
+                by_file.setdefault(os.path.abspath(song["file"]), []).append((name, song))
+        return by_file
 
-            if self.current_song and self.current_song in self.playlists.get(self.selected_playlist, []):
-                sid = self.current_song["id"]
-                self.song_tree.selection_set(sid)
-                self.update_highlight()
-                self.show_metadata_card(self.current_song)
+    def find_duplicates(self):
+        """Hash the whole library in the background and list the songs stored more than once."""
+        if self.duplicates_panel is not None:
+            self.duplicates_panel.lift()
+            return
+        panel = self.duplicates_panel = DuplicatesPanel(self.root, on_remove=self._remove_duplicate,
+                                                        on_play=lambda p, song: self.play_song(song, p),
+                                                        on_close=self._on_duplicates_closed)
+        by_file = self._songs_by_file()
+
+        def run():
+            groups = duplicate_detector.find(
+                list(by_file),
+                progress=lambda done, total: self.dispatcher.call(panel.set_progress, done, total, key="duplicates_progress"),
+                cancelled=lambda: panel.closed)
+            rows = [(n, playlist, song) for n, group in enumerate(groups, 1)
+                    for path in group for playlist, song in by_file[path]]
+            self.dispatcher.call(panel.show, rows, len(groups))
+            if settings.debug_mode:
+                log_info(f"Duplicate scan: {len(groups)} groups in {len(by_file)} files")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _remove_duplicate(self, playlist_name, song):
+        if song not in self.playlists.get(playlist_name, ()):
+            return True  # already gone
+        if not messagebox.askyesno("Confirm", f"Remove '{song['name']}' from '{playlist_name}'?", parent=self.duplicates_panel.win):
+            return False
+        delete_file = messagebox.askyesno("File", "Also delete the file from disk?", parent=self.duplicates_panel.win)
+        self._drop_song(playlist_name, song, delete_file)
+        return True
+
+    def _on_duplicates_closed(self):
+        self.duplicates_panel = None
+
+    def _songs_changed(self):
+        self.refresh_songs()
+        if self.current_song and self.current_song in self.playlists.get(self.selected_playlist, []):
+            sid = self.current_song["id"]
+            self.song_tree.select(sid)
+            self.update_highlight()
+            self.show_metadata_card(self.current_song)
 
-        download_btn = ctk.CTkButton(
-            top, text="Download",
-            command=lambda: threading.Thread(target=start_download).start()
-        )
-        download_btn.pack(padx=5, pady=5)
+    def _build_search_index(self, playlists):
+        start = t.perf_counter()
+        for name, songs in playlists.items():
+            self.search_index.add_many(name, songs)
+        # songs removed or playlists renamed while this ran
+        self.search_index.reconcile(self._locate_song)
+        if settings.debug_mode:
+            log_debug(f"Search index built: {len(self.search_index)} songs in {t.perf_counter() - start:.2f}s")
+        self._refresh_search()
+
+    def _locate_song(self, playlist, song):
+        if song in self.playlists.get(playlist, ()):
+            return playlist
+        return next((name for name, songs in list(self.playlists.items()) if song in songs), None)
+
+    def _schedule_search(self):
+        # wait for a pause in typing instead of searching on every key
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(150, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
+        query = self.search_query()
+        if query:
+            self.search_worker.submit(query)
+        else:
+            self._show_search_results("", [])
+
+    def search_query(self):
+        return self.search_entry.get().strip()
+
+    def clear_search(self):
+        self.search_entry.delete(0, tk.END)
+        self._run_search()
+
+    def _refresh_search(self):
+        # re-run the current query after the library changed; safe from any thread
+        self.dispatcher.call(self._run_search, key="search_refresh")
+
+    def _show_search_results(self, query, results):
+        if query != self.search_query():
+            return  # typed on since; a newer search is on its way
+        self._search_results = results
+        if query:
+            if not self.search_frame.winfo_ismapped():
+                self.song_frame.pack_forget()
+                self.search_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5, before=self.import_frame)
+            self.search_tree.set_items(range(len(results)), index_of=lambda i: i)
+        elif self.search_frame.winfo_ismapped():
+            self.search_frame.pack_forget()
+            self.song_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5, before=self.import_frame)
+
+    def _search_row(self, index):
+        playlist, song = self._search_results[index]
+        return (song["name"], (song.get("metadata") or {}).get("artist", ""), playlist, "▶")
+
+    def on_search_click(self, event):
+        region = self.search_tree.identify("region", event.x, event.y)
+        if region == "cell" and self.search_tree.identify_column(event.x) == "#4":
+            index = self.search_tree.key_at(event.y)
+            if index is not None:
+                self.play_search_result(index)
+                return "break"
+
+    def play_search_result(self, index):
+        if 0 <= index < len(self._search_results):
+            playlist, song = self._search_results[index]
+            if song in self.playlists.get(playlist, ()):
+                self.play_song(song, playlist)
+
+    def reveal_search_result(self, index):
+        """Clear the search and select the song in its playlist."""
+        if index is None or not 0 <= index < len(self._search_results):
+            return
+        playlist, song = self._search_results[index]
+        names = list(self.playlists)
+        if playlist not in names or song not in self.playlists[playlist]:
+            return
+        self.clear_search()
+        self.playlist_listbox.selection_clear(0, tk.END)
+        self.playlist_listbox.selection_set(names.index(playlist))
+        self.playlist_listbox.see(names.index(playlist))
+        self.on_playlist_select(None)
+        self.song_tree.select(song["id"])
 
     def show_metadata_card(self, song):
-        # only show if we have metadata
-        meta = song.get("metadata") or {}
+        # only show if we have metadata; unchanged fields are not redrawn
         if isinstance(song, dict):
-            meta = song.get("metadata", {}) or {}
-        if not meta:
-            return
-
-        for w in self.meta_frame.winfo_children():
-            w.destroy()
-
-        self.meta_frame.configure(fg_color="#1e1e1e")
-        self.meta_frame.pack_propagate(False)
-        self.meta_frame.configure(width=290, height=400)
-
-        # --- COVER ART ---
-        if meta.get("cover_data"):
-            from io import BytesIO
-            from PIL import Image
-            bio = BytesIO(meta["cover_data"])
-            img = Image.open(bio)
-            photo = ctk.CTkImage(img, size=(180, 180))
-            lbl = ctk.CTkLabel(self.meta_frame, image=photo, text="", text_color="#1e1e1e", fg_color="transparent")
-            lbl.image = photo
-            lbl.pack(pady=(10,5))
-
-        # FONT
-        title_font   = ("Yu Gothic UI Semibold", 16)
-        artist_font  = ("Yu Gothic UI", 10)
-        info_color   = "#d1d1d1"
-
-        # --- TITLE / ARTIST ---
-        ctk.CTkLabel(self.meta_frame, text=meta["title"],
-                font=title_font, text_color="white", fg_color="#1e1e1e",
-                wraplength=200, justify="center").pack(pady=(0,5), padx=10)
-        ctk.CTkLabel(self.meta_frame, text=meta["artist"].replace("/", ", "),
-                font=artist_font, text_color=info_color, fg_color="#1e1e1e",
-                wraplength=200, justify="center").pack(pady=(0,10), padx=10)
-
-        # --- DURATION & ALBUM ---
-        info_str = f"{self.format_time(meta['duration'])}"
-        if meta.get("album"):
-            info_str += f"   •   {meta['album']}"
-        ctk.CTkLabel(self.meta_frame, text=info_str,
-                font=artist_font, text_color=info_color, fg_color="#1e1e1e").pack()
-        
-        genre_txt = "Genre: "
-        try:
-            for i in range(len(meta["genre"])):
-                if settings.debug_mode:
-                    log_debug(f"Genre: {meta['genre'][i]}") 
-                genre_txt += meta["genre"][i]
-        except Exception as e:
-            if settings.debug_mode:
-                log_debug(f"Error: {e}")
-            genre_txt += "Unknown"
-            pass
-        
-        ctk.CTkLabel(self.meta_frame, text=genre_txt,
-                font=artist_font, text_color=info_color, fg_color="transparent",
-                wraplength=200, justify="center").pack()
-        
-        # --- LYRICS SCROLLABLE ---
-        if meta.get("lyrics"):
-            lyrics_frame = ctk.CTkFrame(self.meta_frame, fg_color="#1e1e1e")
-            lyrics_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0,10))
-            scrollbar = ctk.CTkScrollbar(lyrics_frame, orientation=tk.VERTICAL)
-            text_box  = tk.Text(
-                lyrics_frame, wrap=tk.WORD, bg="#1e1e1e", fg="white",
-                font=("Noto Sans Georgian Bold", 9), bd=0, yscrollcommand=scrollbar.set
-            )
-            scrollbar.configure(command=text_box.yview)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            text_box.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            
-            raw = meta["lyrics"]
-
-            m1 = re.search(r'Lyrics[:\s]*(.*)', raw, re.DOTALL)
-            if m1:
-                lyrics = m1.group(1).strip()
-            else:
-                m2 = re.search(r'\[Intro\][:\s]*(.*)', raw, re.DOTALL)
-                if m2:
-                    lyrics = m2.group(1).strip()
-                else:
-                    lyrics = raw
-                    log_debug("No match for lyrics in metadata: using full text")
-
-            lyrics = re.sub(r'[\"“”]([^\"“”]*?)[\"“”]', r'(\1)', lyrics)
-            
-            text_box.configure(state=tk.NORMAL)
-            text_box.delete("1.0", tk.END)
-            text_box.insert("1.0", lyrics)
-            text_box.configure(state=tk.DISABLED)
+            self.metadata_card.show(song)
 
-        else:
-            ctk.CTkLabel(self.meta_frame, text="No lyrics available", font=("Noto Sans Georgian Bold", 11), text_color="gray",
-                    fg_color="#1e1e1e").pack(expand=True)
-                
     def import_song(self):
         if not self.selected_playlist:
             messagebox.showerror("Error", "Select a playlist first")
             return
+        from tkinter import filedialog
         file_path = filedialog.askopenfilename(filetypes=[("Audio Files", "*.mp3 *.wav"), ("All Files", "*.*")])
         if not file_path:
             return
-        default_id = str(len(self.playlists[self.selected_playlist]) + 1)
+        default_id = self.playlists[self.selected_playlist].peek_id()
         default_name = os.path.basename(file_path)[:-4] # remove file extension (.mp3, .wav)
         def save():
             song_id = id_var.get().strip()
@@ -690,20 +919,54 @@ class App:
             if song_id == "" or song_name == "":
                 messagebox.showerror("Error", "ID and Name cannot be empty")
                 return
-            for song in self.playlists[self.selected_playlist]:
-                if song["id"] == song_id:
-                    messagebox.showerror("Error", "Song ID already exists")
-                    log_error(f"Song ID already exists: {song_id}", song_id)
-                    return
-                try:
-                    int(song_id)  # Check if ID is an integer
-                except ValueError as e:
-                    messagebox.showerror("Error", "Song ID must be an integer")
-                    log_error(f"Song ID must be an integer: {song_id}", e)
+            if self.playlists[self.selected_playlist].get(song_id):
+                messagebox.showerror("Error", "Song ID already exists")
+                log_error(f"Song ID already exists: {song_id}", song_id)
+                return
+            try:
+                int(song_id)  # Check if ID is an integer
+            except ValueError as e:
+                messagebox.showerror("Error", "Song ID must be an integer")
+                log_error(f"Song ID must be an integer: {song_id}", e)
+                return
+            playlist_name = self.selected_playlist
+            if not settings.detect_duplicates:
+                add(playlist_name, song_id, song_name)
+                return
+            # hashing reads the whole file: done on the detector's pool, the answer comes back here
+            save_btn.configure(state="disabled")
+            by_file = self._songs_by_file()
+            duplicate_detector.check(file_path, set(by_file),
+                                     lambda same: self.dispatcher.call(confirm, playlist_name, song_id, song_name, same, by_file))
+
+        def confirm(playlist_name, song_id, song_name, same, by_file):
+            if not top.winfo_exists():
+                return
+            save_btn.configure(state="normal")
+            if same:
+                names = [f"'{s['name']}' ({p})" for path in same for p, s in by_file[path]]
+                if not messagebox.askyesno("Duplicate", f"This song is already in the library as {', '.join(names[:3])}.\nImport it anyway?", parent=top):
                     return
-            new_song = {"id": song_id, "name": song_name, "file": file_path}
-            self.playlists[self.selected_playlist].append(new_song)
-            self.refresh_songs()
+            add(playlist_name, song_id, song_name)
+
+        def add(playlist_name, song_id, song_name):
+            playlist = self.playlists.get(playlist_name)
+            if playlist is None:
+                top.destroy()
+                return
+            if playlist.get(song_id):
+                # taken while the file was being checked
+                messagebox.showerror("Error", "Song ID already exists", parent=top)
+                return
+            new_song = {"id": song_id, "name": song_name, "file": file_path,
+                        "metadata": metadata_index.load(file_path)}
+            playlist.add(new_song)
+            library_store.save_song(playlist_name, new_song)
+            self.search_index.add(playlist_name, new_song)
+            loudness_analyzer.analyze([file_path])
+            self._refresh_search()
+            if playlist_name == self.selected_playlist:
+                self.refresh_songs()
             top.destroy()
             
         top = ctk.CTkToplevel(self.root)
@@ -718,129 +981,28 @@ class App:
         ctk.CTkLabel(top, text="Song Name", font=("Arial", 12)).pack(padx=5, pady=5)
         name_var = tk.StringVar(value=default_name)
         ctk.CTkEntry(top, textvariable=name_var, width=200, font=("Arial", 12)).pack(padx=5, pady=5)
-        ctk.CTkButton(top, text="Save", command=save).pack(padx=5, pady=5)
+        save_btn = ctk.CTkButton(top, text="Save", command=save)
+        save_btn.pack(padx=5, pady=5)
 
-    def download_song(self, link=None):
-        top = ctk.CTkToplevel(self.root)
-        
-        style = ttk.Style()
-        style.configure('Custom.TButton', font=('Helvetica', 9), padding=(5, 1))
-        
-        top.title("Download Song from YouTube")
-        top.attributes('-topmost', True)
-        top.resizable(False, False)
-        
-        ctk.CTkLabel(top, text="YouTube URL:", font=("Arial", 12)).pack(padx=5, pady=5)
-        if link is None:
-            url_var = tk.StringVar()
-        else:
-            url_var = tk.StringVar(value=link)
-        ctk.CTkEntry(top, textvariable=url_var, width=370).pack(padx=5, pady=5)
-        
-        progress_label = ctk.CTkLabel(top, text="Idle", font=("Arial", 12))
-        progress_label.pack(padx=5, pady=5)
-        progress_bar = ctk.CTkProgressBar(top, mode='indeterminate')
-        progress_bar.pack(padx=5, pady=5, fill=tk.X)
-        cancel_btn = ctk.CTkButton(top, text="Cancel")
-        cancel_btn.pack(padx=5, pady=5)
-        
-        def start_download():
-            url = url_var.get().strip()
-            if url == "":
-                messagebox.showerror("Error", "URL cannot be empty")
-                return
-            sound_dir = settings.default_download_path
-            if not os.path.exists(sound_dir):
-                os.makedirs(sound_dir)
-            initial_files = set(os.listdir(sound_dir))
-            command = settings.youtube_cmd.replace("{url}", url).replace("{out}", sound_dir)
-            print(command)
-            if settings.debug_mode:
-                log_debug(f"Dowloading YT song with command: {command}")
-                log_info(f"Sound directory: {sound_dir}")
-
-                        
-            progress_bar.start()
-            progress_label.configure(text="Downloading...")
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-            cancelled = False
-
-            def cancel_download():
-                nonlocal cancelled
-                cancelled = True
-                process.terminate()
-                progress_label.configure(text="Cancelling...")
-            
-            cancel_btn.configure(command=cancel_download)
-            stdout, stderr = process.communicate()
-            progress_bar.stop()
-            
-            if cancelled:
-                progress_label.configure(text="Download cancelled.")
-                if settings.debug_mode:
-                    log_info("Download cancelled")
-                top.after(2000, top.destroy)
-                return
-            if process.returncode != 0:
-                messagebox.showerror("Error", f"Download failed: {stderr}")
-                if settings.debug_mode:
-                    log_error(f"Download failed: {stderr}", stderr)
-                top.destroy()
-                return
-            progress_label.configure(text="Download complete.")
-            top.after(1000, top.destroy)
-            
-            t.sleep(1)  
-            new_files = set(os.listdir(sound_dir)) - initial_files
-            
-            if self.selected_playlist is None:
-                messagebox.showwarning("Warning", "Nessuna playlist selezionata. I brani scaricati non verranno aggiunti automaticamente.")
-                return
-            
-            for filename in new_files:
-                if not filename.lower().endswith(('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')):
-                    continue
-                file_path = os.path.join(sound_dir, filename)
-                default_id = str(len(self.playlists[self.selected_playlist]) + 1)
-                new_song = {"id": default_id, "name": filename, "file": file_path}
-                self.playlists[self.selected_playlist].append(new_song)
-            self.refresh_songs()
-            save_config_rt(self.playlists)
-        
-            if self.current_song and self.current_song in self.playlists.get(self.selected_playlist, []):
-                sid = self.current_song["id"]
-                self.song_tree.selection_set(sid)
-                self.update_highlight()
-                self.show_metadata_card(self.current_song)
-        
-        download_btn = ctk.CTkButton(top, text="Download",
-                                command=lambda: threading.Thread(target=start_download).start()
-                                )
-        download_btn.pack(padx=5, pady=5)
-        
     def remove_song(self):
-        sel = self.song_tree.selection()
-        if not sel:
+        song_id = self.song_tree.selected_key()
+        if song_id is None:
             if settings.debug_mode:
                 log_debug("No song is currently selected")
             return
 
-        song_id = sel[0]
-        playlist = self.playlists.get(self.selected_playlist, [])
-        song = next((s for s in playlist if s["id"] == song_id), None)
+        playlist = self.playlists.get(self.selected_playlist) or Playlist()
+        song = playlist.get(song_id)
 
         if not song:
             return
 
         if self.current_song and self.current_song["id"] == song_id:
-            pygame.mixer.music.stop()
-            try:
-                pygame.mixer.music.unload()
-            except:
-                pass
+            playback_engine.stop(wait=True)
             self.current_song = None
             self.now_playing_label.configure(text="Now Playing: None")
             self.slider.set(0)
+            self.waveform.clear()
 
         delete_file = False
 
@@ -854,6 +1016,17 @@ class App:
         else:
             delete_file = True
 
+        self._drop_song(self.selected_playlist, song, delete_file)
+
+    def _drop_song(self, playlist_name, song, delete_file=False):
+        """Remove song from playlist_name, and its file too if delete_file."""
+        if self.current_song is song:
+            playback_engine.stop(wait=True)
+            self.current_song = None
+            self.now_playing_label.configure(text="Now Playing: None")
+            self.slider.set(0)
+            self.waveform.clear()
+
         if delete_file:
             try:
                 if os.path.exists(song["file"]):
@@ -862,26 +1035,23 @@ class App:
             except Exception as e:
                 log_info(f"Error deleting file: {e}")
 
-        self.playlists[self.selected_playlist] = [s for s in playlist if s["id"] != song_id]
-
-        if self.song_tree.exists(song_id):
-            self.song_tree.delete(song_id)
-
-        self.refresh_songs()
+        self.playlists[playlist_name].remove(song["id"])
+        library_store.delete_song(playlist_name, song["id"])
+        self.search_index.remove(song)
+        self._refresh_search()
+        if self.preloaded is not None and self.preloaded["id"] == song["id"]:
+            self._preload_next()
+        if playlist_name == self.selected_playlist:
+            self.refresh_songs()
 
 
 
     def edit_song(self, event):
-        selected_item = self.song_tree.selection()
-        if not selected_item:
+        song_id = self.song_tree.selected_key()
+        if song_id is None:
             return
-        song_id = selected_item[0]
         songs = self.playlists[self.selected_playlist]
-        song = None
-        for s in songs:
-            if s["id"] == song_id:
-                song = s
-                break
+        song = songs.get(song_id)
         if not song:
             return
         def save():
@@ -890,13 +1060,21 @@ class App:
             if new_id == "" or new_name == "":
                 messagebox.showerror("Error", "ID and Name cannot be empty")
                 return
+            old_id = song["id"]
             if new_id != song["id"]:
-                for s in songs:
-                    if s["id"] == new_id:
-                        messagebox.showerror("Error", "Song ID already exists")
-                        return
-            song["id"] = new_id
+                if songs.get(new_id) not in (None, song):
+                    messagebox.showerror("Error", "Song ID already exists")
+                    return
+                try:
+                    int(new_id)
+                except ValueError:
+                    messagebox.showerror("Error", "Song ID must be an integer")
+                    return
+                songs.change_id(song["id"], new_id)
             song["name"] = new_name
+            library_store.save_song(self.selected_playlist, song, old_id)
+            self.search_index.update(song)
+            self._refresh_search()
             self.refresh_songs()
             top.destroy()
         top = ctk.CTkToplevel(self.root)
@@ -909,86 +1087,126 @@ class App:
         ctk.CTkEntry(top, textvariable=name_var, font=("Arial", 12)).pack(padx=5, pady=5)
         ctk.CTkButton(top, text="Save", font=("Arial", 12), command=save, fg_color="#cccccc").pack(padx=5, pady=5)
 
-    def play_song(self, song=None):
+    def play_song(self, song=None, playlist=None):
         if song is None:
-            selected_item = self.song_tree.selection()
-            if not selected_item:
+            song_id = self.song_tree.selected_key()
+            if song_id is None:
                 messagebox.showerror("Error", "Select a song to play")
                 if settings.debug_mode:
                     log_debug("No song selected")
                 return
-            song_id = selected_item[0]
-            songs = self.playlists[self.selected_playlist]
-            for s in songs:
-                if s["id"] == song_id:
-                    song = s
-                    break
+            song = self.playlists[self.selected_playlist].get(song_id)
             if song is None:
                 return
         self.current_song = song
+        # next/previous follow the playlist the song came from, not the one on screen
+        self.playing_playlist = playlist or self.selected_playlist
+        self.is_paused = False
+        self.preloaded = None
+        # loading happens on the playback thread, the rest follows from its events
+        playback_engine.load(song)
+        self.now_playing_label.configure(text=f"{song['name']}")
+        self.play_pause_btn.configure(image=icons["pause"])
+        self._schedule_tick()
+
+    def _record_played(self, song):
+        songs = self.playlists.get(self.playing_playlist)
+        if songs is not None and song in songs:
+            self._shuffle(self.playing_playlist).played(song)
+
+    def _on_song_started(self, song, length):
+        self.current_song = song
+        self._record_played(song)
+        self.current_song_length = length
+        self._shown_second = None
+        self._show_current_song(song)
+        self._preload_next()
+
+    def _on_play_failed(self, song, e):
+        if settings.debug_mode:
+            log_error(f"Error loading song: {e}", e)
+        if song is self.current_song:
+            self.current_song = None
+
+        # Ask once: if user clicks Yes, remove; if No, do nothing
+        remove = messagebox.askyesno(
+            "Error",
+            f"Cannot play song: {e}\n\n"
+            "Remove this song from the playlist?"
+        )
+        if remove:
+            # remove from the playlist it was played from
+            name = self.playing_playlist if song in self.playlists.get(self.playing_playlist, ()) else self.selected_playlist
+            if song in self.playlists.get(name, ()):
+                self._drop_song(name, song)
+
+    def _show_current_song(self, song):
+        self.slider.configure(to=self.current_song_length)
+        self._show_waveform(song)
+        self.now_playing_label.configure(text=f"{song['name']}")
+        songs = self.playlists.get(self.playing_playlist)
+        self.current_song_index = songs.index_of(song["id"]) if songs is not None else None
         
         try:
-            pygame.mixer.music.load(song["file"])
-            sound_obj = pygame.mixer.Sound(song["file"])
-            self.current_song_length = sound_obj.get_length()
+            self.update_highlight()
             if settings.debug_mode:
-                log_info(f"Loaded song: {song['file']}")
-                
-            pygame.mixer.music.play()
+                log_info(f"Highlight updated for song: {song['name']}")
+        except Exception as e:
             if settings.debug_mode:
-                log_info(f"Playing song: {song['file']}")
-            self.start_time = t.time()
-            self.seek_offset = 0
-            self.paused_position = None
-            self.is_paused = False
-            self.slider.configure(to=self.current_song_length)
-            self.now_playing_label.configure(text=f"{song['name']}")
-            songs = sorted(self.playlists[self.selected_playlist], key=lambda s: int(s["id"]))
-            for index, s in enumerate(songs):
-                if s["id"] == song["id"]:
-                    self.current_song_index = index
-                    break
-            
-            try:
-                self.update_highlight()
-                if settings.debug_mode:
-                    log_info(f"Highlight updated for song: {song['name']}")
-            except Exception as e:
-                if settings.debug_mode:
-                    log_error(f"Error updating highlight: {e}", e)
-                pass
-                
-            try:
-                self.show_metadata_card(song)
-                if settings.debug_mode:
-                    log_info(f"Metadata card shown for song: {song['name']}")
-            except Exception as e:
-                if settings.debug_mode:
-                    log_error(f"Error showing metadata card: {e}", e)
-                pass
+                log_error(f"Error updating highlight: {e}", e)
+            pass
             
+        try:
+            self.show_metadata_card(song)
+            if settings.debug_mode:
+                log_info(f"Metadata card shown for song: {song['name']}")
         except Exception as e:
             if settings.debug_mode:
-                log_error(f"Error loading song: {e}", e)
-
-            # Ask once: if user clicks Yes, remove; if No, do nothing
-            remove = messagebox.askyesno(
-                "Error",
-                f"Cannot play song: {e}\n\n"
-                "Remove this song from the playlist?"
-            )
-            if remove:
-                # remove from current playlist
-                self.playlists[self.selected_playlist] = [
-                    s for s in self.playlists[self.selected_playlist]
-                    if s["id"] != song["id"]
-                ]
-                self.refresh_playlists()
-                self.refresh_songs()
-                # persist the cleaned playlist
-                save_config({"playlists": self.playlists})
+                log_error(f"Error showing metadata card: {e}", e)
+            pass
+
+    def _show_waveform(self, song):
+        peaks = waveform_store.get(song["file"])
+        self.waveform.clear()
+        if peaks is not None:
+            self.waveform.set_peaks(peaks)
+        else:
+            waveform_store.request(song["file"], lambda path, peaks: self.dispatcher.call(self._on_waveform, path, peaks))
+
+    def _on_waveform(self, path, peaks):
+        if self.current_song is not None and self.current_song["file"] == path:
+            self.waveform.set_peaks(peaks)
 
+    def _seek_fraction(self, fraction):
+        if self.current_song is not None and self.current_song_length:
+            self.slider_seek(fraction * self.current_song_length)
+
+    def _preload_next(self):
+        """Queue the upcoming song in the mixer so it starts right when the current one ends."""
+        self.preloaded = None
+        if self.current_song is None:
             return
+        song, playlist, from_queue = self._upcoming_song()
+        self.preloaded = song
+        self._preloaded_from = (playlist, from_queue)
+        playback_engine.queue_next(song)
+        if song is not None:
+            # ready by the time it starts
+            waveform_store.request(song["file"])
+
+    def _start_preloaded(self, song, length):
+        # the mixer already switched to the queued file, only the state follows
+        playlist, from_queue = self._preloaded_from
+        if from_queue and self.play_queue.peek()[0] is song:
+            self.play_queue.pop()
+            self._queue_changed(preload=False)
+        self.current_song = song
+        self.playing_playlist = playlist
+        self._record_played(song)
+        self.current_song_length = length
+        self._shown_second = None
+        self._show_current_song(song)
+        self._preload_next()
 
     def toggle_pause(self):
         if not self.current_song:
@@ -996,79 +1214,132 @@ class App:
                 log_debug("No song is currently playing")
             return
         if self.is_paused:
-            pygame.mixer.music.unpause()
-            self.start_time = t.time()
-            self.seek_offset = self.paused_position
-            self.paused_position = None
+            playback_engine.resume()
             self.is_paused = False
+            self._schedule_tick()
             self.play_pause_btn.configure(image=icons["pause"])
             if settings.debug_mode:
                 log_debug("Song unpaused")
         else:
-            pygame.mixer.music.pause()
-            self.paused_position = t.time() - self.start_time + self.seek_offset
+            playback_engine.pause()
             self.is_paused = True
             self.play_pause_btn.configure(image=icons["play"])
             if settings.debug_mode:
                 log_debug("Song paused")
 
+    def _shuffle(self, name=None):
+        name = name or self.selected_playlist
+        shuffle = self._shuffles.get(name)
+        if shuffle is None:
+            shuffle = self._shuffles[name] = ShuffleEngine(self.playlists[name], seed=settings.shuffle_seed or None)
+        return shuffle
+
+    def _upcoming_song(self):
+        """(song, playlist, from_queue) that next_song() would play, without playing it."""
+        song, playlist = self.play_queue.peek()
+        if song is not None:
+            return song, playlist, True
+        playlist = self.playing_playlist if self.playing_playlist in self.playlists else self.selected_playlist
+        songs = self.playlists.get(playlist)
+        if not songs:
+            return None, None, False
+        if self.shuffle_mode.get():
+            return self._shuffle(playlist).peek(), playlist, False
+        if self.current_song is None or self.current_song not in songs:
+            return songs[0], playlist, False
+        return songs.step(self.current_song["id"], 1), playlist, False
+
     def next_song(self):
-        if not self.selected_playlist:
+        # queued songs first, then the playing playlist (shuffled or in order)
+        song, playlist, from_queue = self._upcoming_song()
+        if song is None:
             return
-        songs = sorted(self.playlists[self.selected_playlist], key=lambda s: int(s["id"]))
+        if from_queue:
+            self.play_queue.pop()
+            # play_song() preloads again once the song started
+            self._queue_changed(preload=False)
+        self.play_song(song, playlist)
+
+    def previous_song(self):
+        playlist = self.playing_playlist if self.playing_playlist in self.playlists else self.selected_playlist
+        songs = self.playlists.get(playlist)
         if not songs:
             return
         if self.shuffle_mode.get():
-            if len(songs) == 1:
-                next_song = songs[0]
-            else:
-                next_song = random.choice([s for s in songs if s["id"] != self.current_song["id"]]) if self.current_song else random.choice(songs)
+            # back through what was actually played, not another random pick
+            prev_song = self._shuffle(playlist).previous() or self.current_song or songs[0]
+        elif self.current_song is None or self.current_song not in songs:
+            prev_song = songs[0]
         else:
-            if self.current_song is None:
-                next_song = songs[0]
-            else:
-                index = self.current_song_index if self.current_song_index is not None else 0
-                next_index = (index + 1) % len(songs)
-                next_song = songs[next_index]
-                
-        self.play_song(next_song)
-
-    def previous_song(self):
-        if not self.selected_playlist:
+            prev_song = songs.step(self.current_song["id"], -1)
+        self.play_song(prev_song, playlist)
+
+    # --- play queue ---
+    def _resolve_queued(self, playlist, song_id):
+        songs = self.playlists.get(playlist)
+        return songs.get(song_id) if songs is not None else None
+
+    def _queue_changed(self, preload=True):
+        self.dispatcher.call(self._save_queue, key="save_queue")
+        if self.queue_panel is not None:
+            self.dispatcher.call(self.queue_panel.refresh, key="queue_panel")
+        if preload:
+            # the head of the queue is what plays next
+            self._preload_next()
+
+    def _save_queue(self):
+        if self.play_queue.version == self._queue_saved:
             return
-        songs = sorted(self.playlists[self.selected_playlist], key=lambda s: int(s["id"]))
-        if not songs:
+        library_store.save_queue(list(self.play_queue))
+        self._queue_saved = self.play_queue.version
+
+    def queue_selected(self, play_next=False):
+        song_id = self.song_tree.selected_key()
+        if song_id is None or not self.selected_playlist:
             return
-        if self.shuffle_mode.get():
-            if len(songs) == 1:
-                prev_song = songs[0]
-            else:
-                prev_song = random.choice([s for s in songs if s["id"] != self.current_song["id"]]) if self.current_song else random.choice(songs)
+        if play_next:
+            self.play_queue.play_next(self.selected_playlist, song_id)
         else:
-            if self.current_song is None:
-                prev_song = songs[0]
-            else:
-                index = self.current_song_index if self.current_song_index is not None else 0
-                prev_index = (index - 1) % len(songs)
-                prev_song = songs[prev_index]
-        self.play_song(prev_song)
+            self.play_queue.add(self.selected_playlist, song_id)
+        self._queue_changed()
+
+    def _describe_queued(self, playlist, song_id):
+        song = self._resolve_queued(playlist, song_id)
+        return (song["name"] if song else "(removed)"), playlist
+
+    def open_queue(self):
+        if self.queue_panel is None:
+            self.queue_panel = QueuePanel(self.root, self.play_queue, self._describe_queued,
+                                          on_change=self._queue_changed, on_close=self._on_queue_closed)
+        else:
+            self.queue_panel.lift()
+
+    def _on_queue_closed(self):
+        self.queue_panel = None
+
+    def on_song_menu(self, event):
+        key = self.song_tree.key_at(event.y)
+        if key is None:
+            return
+        self.song_tree.select(key, see=False)
+        try:
+            self.song_menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            self.song_menu.grab_release()
 
     def slider_seek(self, value):
         if self.slider_updating:
             return
         try:
             pos = float(value)
-            pygame.mixer.music.set_pos(pos)
-            self.start_time = t.time()
-            self.seek_offset = pos
-            if self.is_paused:
-                self.paused_position = pos
+            playback_engine.seek(pos)
+            self._draw_position(pos, force=True)
         except Exception:
             pass
 
     def change_volume(self, value):
         vol = float(value) / 100.0
-        pygame.mixer.music.set_volume(vol)
+        playback_engine.set_volume(vol)
         try:
             text = f"{int(vol * 100)}%"
             self.volume_label.configure(text=text)
@@ -1080,59 +1351,103 @@ class App:
             else:
                 pass
             
+    def _schedule_tick(self, delay=0):
+        """(Re)start the playback tick; there is only ever one pending."""
+        if self._tick_job is not None:
+            self.root.after_cancel(self._tick_job)
+        self._tick_job = self.root.after(delay, self.update_slider)
+
     def update_slider(self):
-        if self.current_song:
-            if self.is_paused and self.paused_position is not None:
-                current_pos = self.paused_position
-            else:
-                current_pos = t.time() - self.start_time + self.seek_offset
+        self._tick_job = None
+        self._pump_events()
+        if not self.current_song or self.is_paused:
+            # nothing to follow: no wakeups until a song is played or unpaused
+            return
 
-            self.slider_updating = True
-            self.slider.configure(command=None)
-            self.slider.set(current_pos)
-            self.slider.configure(command=self.slider_seek)
-            self.slider_updating = False
+        if self.root.state() == "iconic":
+            # minimized: engine events still arrive through the dispatcher, <Map> restarts the tick
+            return
+        self._draw_position(playback_engine.position)
+        self._schedule_tick(500)
 
-            total = self.current_song_length + 1
-            elapsed = int(current_pos)
-            self.slider_time_label.configure(
-                text=f"{self.format_time(elapsed)} / {self.format_time(total)}"
-            )
+    def _draw_position(self, current_pos, force=False):
+        # the slider and label only move once per second
+        second = int(current_pos)
+        if second == self._shown_second and not force:
+            return
+        self._shown_second = second
+        self.slider_updating = True
+        self.slider.set(current_pos)
+        self.slider_updating = False
 
-            if not pygame.mixer.music.get_busy() and current_pos >= total - 1:
-                self.next_song()
+        if self.current_song_length:
+            self.waveform.set_fraction(current_pos / self.current_song_length)
 
-        self.root.after(200, self.update_slider)
+        total = self.current_song_length + 1
+        self.slider_time_label.configure(
+            text=f"{self.format_time(second)} / {self.format_time(total)}"
+        )
+
+    def _pump_events(self):
+        while True:
+            try:
+                event = playback_engine.events.get_nowait()
+            except queue.Empty:
+                return
+            kind, song = event[0], event[1]
+            if kind == STARTED:
+                self._on_song_started(song, event[2])
+            elif kind == ADVANCED:
+                self._start_preloaded(song, event[2])
+            elif kind == PLAYBACK_FAILED:
+                self._on_play_failed(song, event[2])
+            elif song is not self.current_song:
+                # about a song the user already moved away from
+                continue
+            elif kind == ENDED:
+                self.next_song()
+            elif kind == LENGTH:
+                self.current_song_length = event[2]
+                self.slider.configure(to=event[2])
         
     def open_settings(self):
         SettingsWindow(
             self.root,
             settings,
-            on_close=lambda: save_settings(settings),
+            on_close=self._on_settings_saved,
             on_change=self.update_label_info(self.label_info)
         )
 
+    def _on_settings_saved(self):
+        save_settings(settings)
+        # the target may have changed; songs started from now on use the new gain
+        loudness_analyzer.reset_gains()
+        self.analyze_loudness()
+
     def on_close(self):
-        # prepara una copia pulita di self.playlists
-        clean_playlists = {}
-        for pname, songs in self.playlists.items():
-            clean_list = []
-            for s in songs:
-                clean_list.append({
-                    "id":   s["id"],
-                    "name": s["name"],
-                    "file": s["file"]
-                })
-            clean_playlists[pname] = clean_list
-
-        data_to_save = { "playlists": clean_playlists }
-
-        save_config(data_to_save)
+        save_config_rt(self.playlists)
+        self._save_queue()
         save_settings(settings)
+        if self.scanner:
+            self.scanner.cancel()
+        download_manager.cancel_all()
+        playback_engine.on_event = None
+        playback_engine.shutdown()
+        self.dispatcher.close()
+        self.library_watcher.stop()
+        if settings.debug_mode:
+            log_info(f"Artwork cache: {artwork_cache.stats()}")
+        loudness_analyzer.close()
+        waveform_store.close()
+        duplicate_detector.close()
+        metadata_index.close()
+        self.library.close()
+        library_store.close()
         self.root.destroy()
 
 if __name__ == "__main__":
     window = ctk.CTk()
+    startup.mark("Tk root")
     app = App(window)
     window.minsize(950, 580)
     window.mainloop()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import time, threading
+from collections import OrderedDict
+
+from dep.settings import log_error
+
+class UIDispatcher:
+    """
+    Runs callables on the Tk thread. Any thread may call(); calls are
+    collected in one pending queue that the Tk thread drains in a batch.
+    Calls sharing a key are coalesced: only the last one queued before the
+    next drain runs, so ten refresh requests in one frame cost one refresh.
+
+    With a threaded Tcl a small waker thread posts a virtual event (the only
+    Tk call made off the Tk thread, so callers never block on it) and
+    nothing runs while there is no work; otherwise the Tk thread polls.
+    """
+    def __init__(self, root, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        try:
+            self._threaded = root.tk.eval("set tcl_platform(threaded)") == "1"
+        except Exception:
+            self._threaded = False
+        if self._threaded:
+            root.bind("<<Dispatch>>", lambda e: self.drain(), add="+")
+            threading.Thread(target=self._waker, daemon=True).start()
+        else:
+            root.after(poll_ms, self._poll)
+
+    def call(self, fn, *args, key=None):
+        """Run fn(*args) on the Tk thread; a newer call with the same key replaces it."""
+        with self._lock:
+            if key is None:
+                key = object()
+            # an existing key keeps the position of the first request and runs the latest arguments
+            self._pending[key] = (fn, args)
+        self._wake.set()
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+        for fn, args in pending.values():
+            try:
+                fn(*args)
+            except Exception as e:
+                log_error(f"UI callback {getattr(fn, '__name__', fn)} failed: {e}", e)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+
+    def _waker(self):
+        while True:
+            self._wake.wait()
+            if self._closed:
+                return
+            self._wake.clear()
+            try:
+                # tkinter hands this over to the Tk thread and waits for it
+                self.root.event_generate("<<Dispatch>>", when="tail")
+            except Exception:
+                # main loop not running (yet, or any more); try again shortly
+                if self._closed:
+                    return
+                time.sleep(0.1)
+                self._wake.set()
+
+    def _poll(self):
+        if self._closed:
+            return
+        self.drain()
+        self.root.after(self.poll_ms, self._poll)
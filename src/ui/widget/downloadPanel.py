@@ -0,0 +1,68 @@
+import tkinter as tk
+from tkinter import ttk
+import customtkinter as ctk
+
+class DownloadPanel:
+    """Window listing every download job and its state."""
+    def __init__(self, master, manager, on_close=None):
+        self.manager = manager
+        self.on_close = on_close
+
+        self.win = ctk.CTkToplevel(master)
+        self.win.title("Downloads")
+        self.win.geometry("620x320")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.tree = ttk.Treeview(self.win, columns=("ID", "Source", "URL", "State"), show="headings",
+                                 style="BW.Treeview", selectmode="extended")
+        for col, width in (("ID", 40), ("Source", 70), ("URL", 330), ("State", 140)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="w" if col == "URL" else "center")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        buttons = ctk.CTkFrame(self.win, fg_color="transparent")
+        buttons.pack(fill=tk.X, padx=5, pady=(0,5))
+        ctk.CTkButton(buttons, text="Cancel Selected", command=self.cancel_selected).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Cancel All", command=self.manager.cancel_all).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Clear Finished", command=self.clear_finished).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+
+        self._rows = {}
+        self.refresh()
+
+    def lift(self):
+        self.win.deiconify()
+        self.win.lift()
+
+    def refresh(self):
+        jobs = self.manager.jobs()
+        ids = set()
+        for job in jobs:
+            iid = str(job.id)
+            ids.add(iid)
+            values = (job.id, job.kind.capitalize(), job.url, job.message)
+            if self._rows.get(iid) != values:
+                if iid in self._rows:
+                    self.tree.item(iid, values=values)
+                else:
+                    self.tree.insert("", tk.END, iid=iid, values=values)
+                self._rows[iid] = values
+        for iid in list(self._rows):
+            if iid not in ids:
+                self.tree.delete(iid)
+                del self._rows[iid]
+        self._after = self.win.after(500, self.refresh)
+
+    def cancel_selected(self):
+        for iid in self.tree.selection():
+            job = self.manager.get(int(iid))
+            if job and not job.finished:
+                job.cancel()
+
+    def clear_finished(self):
+        self.manager.clear_finished()
+
+    def close(self):
+        self.win.after_cancel(self._after)
+        self.win.destroy()
+        if self.on_close:
+            self.on_close()
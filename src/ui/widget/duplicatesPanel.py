@@ -0,0 +1,93 @@
+import os
+import tkinter as tk
+import customtkinter as ctk
+
+from ui.widget.virtualTree import VirtualTreeview
+
+class DuplicatesPanel:
+    """Window with the songs whose audio is stored more than once, grouped."""
+    def __init__(self, master, on_remove=None, on_play=None, on_close=None):
+        self.on_remove = on_remove
+        self.on_play = on_play
+        self.on_close = on_close
+        self.closed = False
+        self.rows = []  # (group number, playlist, song)
+
+        self.win = ctk.CTkToplevel(master)
+        self.win.title("Duplicates")
+        self.win.geometry("640x380")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.status = ctk.CTkLabel(self.win, text="Hashing library...", anchor="w")
+        self.status.pack(fill=tk.X, padx=8, pady=(5,0))
+        self.progress = ctk.CTkProgressBar(self.win, mode="determinate", height=6)
+        self.progress.set(0)
+        self.progress.pack(fill=tk.X, padx=8, pady=(0,5))
+
+        frame = ctk.CTkFrame(self.win, fg_color="transparent")
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.tree = VirtualTreeview(frame, columns=("Group", "Song", "Playlist", "File"), show="headings",
+                                    style="BW.Treeview", selectmode="browse",
+                                    values=self._row)
+        for col, width in (("Group", 50), ("Song", 220), ("Playlist", 100), ("File", 240)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="center" if col == "Group" else "w")
+        scrollbar = ctk.CTkScrollbar(frame, orientation=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure_yscroll(scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.bind("<Double-1>", lambda e: self.play())
+
+        buttons = ctk.CTkFrame(self.win, fg_color="transparent")
+        buttons.pack(fill=tk.X, padx=5, pady=(0,5))
+        ctk.CTkButton(buttons, text="Play", command=self.play).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Remove Selected", command=self.remove).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Close", command=self.close).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+
+    def _row(self, index):
+        group, playlist, song = self.rows[index]
+        return (group, song["name"], playlist, os.path.basename(song["file"]))
+
+    def lift(self):
+        self.win.deiconify()
+        self.win.lift()
+
+    def set_progress(self, done, total):
+        if self.closed:
+            return
+        if total:
+            self.progress.set(done / total)
+        self.status.configure(text=f"Hashing library {done}/{total}")
+
+    def show(self, rows, groups):
+        """rows: (group number, playlist, song) for every song in a group of duplicates."""
+        if self.closed:
+            return
+        self.rows = rows
+        self.progress.pack_forget()
+        self.status.configure(text=f"{groups} songs stored more than once" if groups else "No duplicates found")
+        self.tree.set_items(range(len(rows)), index_of=lambda i: i)
+
+    def play(self):
+        index = self.tree.selected_key()
+        if index is not None and self.on_play:
+            _, playlist, song = self.rows[index]
+            self.on_play(playlist, song)
+
+    def remove(self):
+        index = self.tree.selected_key()
+        if index is None:
+            return
+        _, playlist, song = self.rows[index]
+        if self.on_remove and not self.on_remove(playlist, song):
+            return
+        del self.rows[index]
+        self.tree.set_items(range(len(self.rows)), index_of=lambda i: i)
+        if self.rows:
+            self.tree.select(min(index, len(self.rows) - 1))
+
+    def close(self):
+        self.closed = True
+        self.win.destroy()
+        if self.on_close:
+            self.on_close()
@@ -0,0 +1,143 @@
+import re
+import tkinter as tk
+import customtkinter as ctk
+
+from dep.settings import log_debug, settings
+from dep.artwork import artwork_cache
+from dep.metadata import metadata_index
+
+TITLE_FONT  = ("Yu Gothic UI Semibold", 16)
+ARTIST_FONT = ("Yu Gothic UI", 10)
+INFO_COLOR  = "#d1d1d1"
+CARD_BG     = "#1e1e1e"
+
+def clean_lyrics(raw):
+    m1 = re.search(r'Lyrics[:\s]*(.*)', raw, re.DOTALL)
+    if m1:
+        lyrics = m1.group(1).strip()
+    else:
+        m2 = re.search(r'\[Intro\][:\s]*(.*)', raw, re.DOTALL)
+        if m2:
+            lyrics = m2.group(1).strip()
+        else:
+            lyrics = raw
+            log_debug("No match for lyrics in metadata: using full text")
+
+    return re.sub(r'[\"“”]([^\"“”]*?)[\"“”]', r'(\1)', lyrics)
+
+class MetadataCard:
+    """Metadata card built once and updated in place for every song."""
+    def __init__(self, frame, format_time):
+        self.frame = frame
+        self.format_time = format_time
+        self._song = None
+        self._meta = None
+        self._values = {}
+        self._visible = False
+
+        self.cover_label = ctk.CTkLabel(frame, text="", text_color=CARD_BG, fg_color="transparent")
+        self.title_label = ctk.CTkLabel(frame, text="", font=TITLE_FONT, text_color="white",
+                                        fg_color=CARD_BG, wraplength=200, justify="center")
+        self.artist_label = ctk.CTkLabel(frame, text="", font=ARTIST_FONT, text_color=INFO_COLOR,
+                                         fg_color=CARD_BG, wraplength=200, justify="center")
+        self.info_label = ctk.CTkLabel(frame, text="", font=ARTIST_FONT, text_color=INFO_COLOR, fg_color=CARD_BG)
+        self.genre_label = ctk.CTkLabel(frame, text="", font=ARTIST_FONT, text_color=INFO_COLOR,
+                                        fg_color="transparent", wraplength=200, justify="center")
+
+        # --- LYRICS SCROLLABLE ---
+        self.lyrics_frame = ctk.CTkFrame(frame, fg_color=CARD_BG)
+        self.scrollbar = ctk.CTkScrollbar(self.lyrics_frame, orientation=tk.VERTICAL)
+        self.text_box = tk.Text(
+            self.lyrics_frame, wrap=tk.WORD, bg=CARD_BG, fg="white",
+            font=("Noto Sans Georgian Bold", 9), bd=0, yscrollcommand=self.scrollbar.set,
+            state=tk.DISABLED
+        )
+        self.scrollbar.configure(command=self.text_box.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text_box.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.no_lyrics_label = ctk.CTkLabel(frame, text="No lyrics available", font=("Noto Sans Georgian Bold", 11),
+                                            text_color="gray", fg_color=CARD_BG)
+
+    def _changed(self, field, value):
+        if self._values.get(field, object()) == value:
+            return False
+        self._values[field] = value
+        return True
+
+    def show(self, song):
+        meta = song.get("metadata") or {}
+        if not meta:
+            return
+        # same song, same metadata: nothing to redraw
+        if self._visible and song is self._song and meta is self._meta:
+            return
+        self._song = song
+        self._meta = meta
+
+        if not self._visible:
+            self.frame.configure(fg_color=CARD_BG, width=290, height=400)
+            self.frame.pack_propagate(False)
+            self.title_label.pack(pady=(0,5), padx=10)
+            self.artist_label.pack(pady=(0,10), padx=10)
+            self.info_label.pack()
+            self.genre_label.pack()
+            self._visible = True
+
+        # --- COVER ART ---
+        # only the key is kept with the song; the image bytes are read when no thumbnail is cached
+        cover = meta.get("cover")
+        if self._values.get("cover") != cover:
+            self._values["cover"] = cover
+            photo = artwork_cache.get_key(cover, lambda: metadata_index.cover(cover))
+            if photo is not None:
+                self.cover_label.configure(image=photo)
+                self.cover_label.image = photo
+                if not self.cover_label.winfo_ismapped():
+                    self.cover_label.pack(pady=(10,5), before=self.title_label)
+            else:
+                self.cover_label.pack_forget()
+
+        # --- TITLE / ARTIST ---
+        title = meta.get("title", song.get("name", ""))
+        if self._changed("title", title):
+            self.title_label.configure(text=title)
+        artist = meta.get("artist", "").replace("/", ", ")
+        if self._changed("artist", artist):
+            self.artist_label.configure(text=artist)
+
+        # --- DURATION & ALBUM ---
+        info_str = f"{self.format_time(meta.get('duration', 0))}"
+        if meta.get("album"):
+            info_str += f"   •   {meta['album']}"
+        if self._changed("info", info_str):
+            self.info_label.configure(text=info_str)
+
+        genre = meta.get("genre")
+        genre_txt = "Genre: " + (", ".join(genre) if genre else "Unknown")
+        if self._changed("genre", genre_txt):
+            if settings.debug_mode:
+                log_debug(genre_txt)
+            self.genre_label.configure(text=genre_txt)
+
+        # --- LYRICS ---
+        raw = meta.get("lyrics")
+        if self._changed("lyrics", raw):
+            if raw:
+                self.text_box.configure(state=tk.NORMAL)
+                self.text_box.delete("1.0", tk.END)
+                self.text_box.insert("1.0", clean_lyrics(raw))
+                self.text_box.configure(state=tk.DISABLED)
+                self.no_lyrics_label.pack_forget()
+                self.lyrics_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0,10))
+            else:
+                self.lyrics_frame.pack_forget()
+                self.no_lyrics_label.pack(expand=True)
+
+    def clear(self):
+        for w in (self.cover_label, self.title_label, self.artist_label, self.info_label,
+                  self.genre_label, self.lyrics_frame, self.no_lyrics_label):
+            w.pack_forget()
+        self._song = None
+        self._meta = None
+        self._values = {}
+        self._visible = False
@@ -0,0 +1,83 @@
+import tkinter as tk
+import customtkinter as ctk
+
+from ui.widget.virtualTree import VirtualTreeview
+
+class QueuePanel:
+    """Window listing the play queue, with reordering."""
+    def __init__(self, master, play_queue, describe, on_change=None, on_close=None):
+        self.queue = play_queue
+        self.describe = describe
+        self.on_change = on_change
+        self.on_close = on_close
+
+        self.win = ctk.CTkToplevel(master)
+        self.win.title("Queue")
+        self.win.geometry("480x360")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        frame = ctk.CTkFrame(self.win, fg_color="transparent")
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # rows are queue positions; only the visible ones are looked up
+        self.tree = VirtualTreeview(frame, columns=("#", "Song", "Playlist"), show="headings",
+                                    style="BW.Treeview", selectmode="browse",
+                                    values=self._row)
+        for col, width in (("#", 40), ("Song", 280), ("Playlist", 120)):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="w" if col == "Song" else "center")
+        scrollbar = ctk.CTkScrollbar(frame, orientation=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure_yscroll(scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        buttons = ctk.CTkFrame(self.win, fg_color="transparent")
+        buttons.pack(fill=tk.X, padx=5, pady=(0,5))
+        ctk.CTkButton(buttons, text="Up", command=lambda: self.move(-1)).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Down", command=lambda: self.move(1)).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Remove", command=self.remove).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        ctk.CTkButton(buttons, text="Clear", command=self.clear).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+
+        self.refresh()
+
+    def _row(self, index):
+        playlist, song_id = self.queue[index]
+        name, playlist = self.describe(playlist, song_id)
+        return (index + 1, name, playlist)
+
+    def lift(self):
+        self.win.deiconify()
+        self.win.lift()
+
+    def refresh(self, select=None):
+        if select is None:
+            select = self.tree.selected_key()
+        self.tree.set_items(range(len(self.queue)), index_of=lambda i: i)
+        if select is not None and 0 <= select < len(self.queue):
+            self.tree.select(select)
+
+    def _changed(self, select=None):
+        self.refresh(select)
+        if self.on_change:
+            self.on_change()
+
+    def move(self, offset):
+        index = self.tree.selected_key()
+        if index is None:
+            return
+        self._changed(self.queue.move(index, offset))
+
+    def remove(self):
+        index = self.tree.selected_key()
+        if index is None:
+            return
+        self.queue.remove(index)
+        self._changed(min(index, len(self.queue) - 1))
+
+    def clear(self):
+        self.queue.clear()
+        self._changed()
+
+    def close(self):
+        self.win.destroy()
+        if self.on_close:
+            self.on_close()
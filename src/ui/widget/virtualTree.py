@@ -0,0 +1,193 @@
+import tkinter as tk
+from tkinter import ttk
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    Treeview that only materializes the rows inside the viewport (plus a
+    small overscan) and scrolls through a backing sequence of items.
+    Rows are addressed by item key instead of Treeview iids.
+    """
+    def __init__(self, master=None, key=None, values=None, overscan=2, **kwargs):
+        super().__init__(master, **kwargs)
+        self.key = key or (lambda item: item)
+        self.values = values or (lambda item: (item,))
+        self.overscan = overscan
+        self._items = []
+        self._index_of = None
+        self._lazy_index = None
+        self._offset = 0
+        self._rows = 1
+        self._visible = 1
+        self._slots = []  # (iid, item key) of the rows currently materialized
+        self._selected = None
+        self._highlight = None
+        self._highlight_tag = "current"
+        self._yscroll = None
+
+        style = ttk.Style(self)
+        self._rowheight = int(style.lookup(kwargs.get("style", "Treeview"), "rowheight") or 20)
+
+        self.bind("<Configure>", self._on_configure, add="+")
+        self.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.bind("<MouseWheel>", self._on_wheel)
+        self.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        self.bind("<Button-5>", lambda e: self._scroll_units(3))
+        self.bind("<Up>", lambda e: self._move_selection(-1))
+        self.bind("<Down>", lambda e: self._move_selection(1))
+        self.bind("<Prior>", lambda e: self._move_selection(-self._visible))
+        self.bind("<Next>", lambda e: self._move_selection(self._visible))
+
+    # --- model ---
+    def set_items(self, items, index_of=None):
+        """
+        Show `items` (any sequence, kept by reference) and clear the selection.
+        `index_of(key)` gives the position of a key; without it an index is
+        built on first use.
+        """
+        self._items = items
+        self._index_of = index_of
+        self._lazy_index = None
+        self._selected = None
+        self._offset = min(self._offset, self._max_offset())
+        self.refresh()
+
+    def index_of(self, key):
+        if self._index_of is not None:
+            return self._index_of(key)
+        if self._lazy_index is None:
+            self._lazy_index = {self.key(item): i for i, item in enumerate(self._items)}
+        return self._lazy_index.get(key)
+
+    def item_count(self):
+        return len(self._items)
+
+    # --- selection / highlight ---
+    def selected_key(self):
+        return self._selected
+
+    def select(self, key, see=True):
+        self._selected = key
+        if see and key is not None:
+            self.see_key(key)
+        self.refresh()
+
+    def key_at(self, y):
+        row = self.identify_row(y)
+        for iid, key in self._slots:
+            if iid == row:
+                return key
+        return None
+
+    def set_highlight(self, key, tag="current"):
+        if key == self._highlight and tag == self._highlight_tag:
+            return
+        self._highlight = key
+        self._highlight_tag = tag
+        for iid, k in self._slots:
+            self.item(iid, tags=(tag,) if k == key else ())
+
+    # --- scrolling ---
+    def _max_offset(self):
+        return max(0, len(self._items) - self._visible)
+
+    def see_key(self, key):
+        index = self.index_of(key)
+        if index is None:
+            return
+        if index < self._offset:
+            self._offset = index
+        elif index >= self._offset + self._visible:
+            self._offset = index - self._visible + 1
+        self._offset = max(0, min(self._offset, self._max_offset()))
+
+    def configure_yscroll(self, command):
+        self._yscroll = command
+        self._update_scrollbar()
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        n = len(self._items)
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * n)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible
+            self._offset += step
+        self._offset = max(0, min(self._offset, self._max_offset()))
+        self.refresh()
+
+    def _fractions(self):
+        n = len(self._items)
+        if n == 0:
+            return 0.0, 1.0
+        return self._offset / n, min(1.0, (self._offset + self._visible) / n)
+
+    def _update_scrollbar(self):
+        if self._yscroll:
+            self._yscroll(*self._fractions())
+
+    def _scroll_units(self, units):
+        self.yview("scroll", units, "units")
+        return "break"
+
+    def _on_wheel(self, event):
+        return self._scroll_units(-3 if event.delta > 0 else 3)
+
+    def _move_selection(self, step):
+        n = len(self._items)
+        if n == 0:
+            return "break"
+        index = self.index_of(self._selected) if self._selected is not None else None
+        index = 0 if index is None else max(0, min(n - 1, index + step))
+        self.select(self.key(self._items[index]))
+        self.event_generate("<<VirtualSelect>>")
+        return "break"
+
+    # --- rendering ---
+    def _on_configure(self, event):
+        visible = max(1, event.height // self._rowheight - 1)  # minus the heading row
+        if visible != self._visible:
+            self._visible = visible
+            self._rows = visible + self.overscan
+            self._offset = max(0, min(self._offset, self._max_offset()))
+            self.refresh()
+
+    def _on_select(self, event):
+        sel = super().selection()
+        if sel:
+            for iid, key in self._slots:
+                if iid == sel[0]:
+                    self._selected = key
+                    break
+
+    def refresh(self):
+        """Re-render the rows in the viewport from the backing items."""
+        end = min(len(self._items), self._offset + self._rows)
+        wanted = end - self._offset
+
+        # grow/shrink the pool of row widgets to what the viewport needs
+        while len(self._slots) < wanted:
+            iid = super().insert("", tk.END)
+            self._slots.append((iid, None))
+        while len(self._slots) > wanted:
+            iid, _ = self._slots.pop()
+            super().delete(iid)
+
+        selected_iid = None
+        for i in range(wanted):
+            item = self._items[self._offset + i]
+            key = self.key(item)
+            iid = self._slots[i][0]
+            self._slots[i] = (iid, key)
+            tags = (self._highlight_tag,) if key == self._highlight else ()
+            super().item(iid, values=self.values(item), tags=tags)
+            if key == self._selected:
+                selected_iid = iid
+
+        if selected_iid:
+            super().selection_set(selected_iid)
+        elif super().selection():
+            super().selection_set(())
+        self._update_scrollbar()
@@ -0,0 +1,67 @@
+import tkinter as tk
+
+class WaveformView(tk.Canvas):
+    """
+    Peak overview of the current track, drawn as one vertical line per two
+    pixels; the played part is recoloured as the position moves, only the
+    lines that changed. Clicking seeks to that point.
+    """
+    def __init__(self, master, height=40, on_seek=None, bg="#171717", color="#4a4a4a", played="#1ed760"):
+        super().__init__(master, height=height, bg=bg, highlightthickness=0)
+        self.on_seek = on_seek
+        self.color = color
+        self.played = played
+        self._peaks = None
+        self._lines = []
+        self._played_to = 0  # lines before this index are drawn in the played colour
+        self._fraction = 0.0
+        self.bind("<Configure>", lambda e: self._redraw(), add="+")
+        self.bind("<Button-1>", self._on_click)
+
+    def set_peaks(self, peaks):
+        """(n, 2) int8 (min, max) pairs, or None to clear."""
+        self._peaks = peaks
+        self._redraw()
+
+    def clear(self):
+        self._fraction = 0.0
+        self.set_peaks(None)
+
+    def set_fraction(self, fraction):
+        """Played share of the track, 0..1."""
+        self._fraction = min(max(fraction, 0.0), 1.0)
+        to = int(self._fraction * len(self._lines))
+        if to == self._played_to:
+            return
+        lo, hi = sorted((to, self._played_to))
+        color = self.played if to > self._played_to else self.color
+        for line in self._lines[lo:hi]:
+            self.itemconfigure(line, fill=color)
+        self._played_to = to
+
+    def _redraw(self):
+        self.delete("all")
+        self._lines = []
+        self._played_to = 0
+        width, height = self.winfo_width(), self.winfo_height()
+        if self._peaks is None or not len(self._peaks) or width < 4:
+            return
+        import numpy as np
+        columns = min(width // 2, len(self._peaks))
+        # buckets -> columns, keeping the extremes of each group
+        edges = np.linspace(0, len(self._peaks), columns + 1).astype(np.intp)[:-1]
+        lo = np.minimum.reduceat(self._peaks[:, 0], edges).astype(float)
+        hi = np.maximum.reduceat(self._peaks[:, 1], edges).astype(float)
+        mid, scale = height / 2, (height / 2 - 1) / 127
+        step = width / columns
+        for i in range(columns):
+            x = int(i * step) + 1
+            # at least one pixel, so silence still shows as a line
+            self._lines.append(self.create_line(x, mid - hi[i] * scale, x, mid - lo[i] * scale + 1,
+                                                fill=self.color))
+        self.set_fraction(self._fraction)
+
+    def _on_click(self, event):
+        width = self.winfo_width()
+        if self.on_seek is not None and self._lines and width > 0:
+            self.on_seek(min(max(event.x / width, 0.0), 1.0))